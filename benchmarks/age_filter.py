@@ -0,0 +1,79 @@
+"""
+Фильтр по возрасту Twitter аккаунта.
+
+Старая реализация разбирала строку created_at через strptime при каждом обращении
+ к twitter_account_age (дважды на аккаунт). Текущая хранит дату числом (Unix time)
+ и сравнивает ее с порогом, посчитанным один раз за проход.
+
+    python -m benchmarks.age_filter --accounts 100000 --minimum-age 365
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+
+from bot.account import Account, SECONDS_IN_DAY
+from bot.models import TwitterUser, TWITTER_DATE_FORMAT
+
+MINIMUM_ACCOUNT_CREATED_AT = datetime(2008, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+def generate_accounts(count: int) -> list[Account]:
+    accounts = []
+    now = time.time()
+    for number in range(count):
+        account = Account("0x" + "11" * 32, address="0x0", number=number)
+        created_at = int(random.uniform(MINIMUM_ACCOUNT_CREATED_AT, now))
+        account.twitter_info = TwitterUser(rest_id=str(number), created_at=created_at, followers_count=0)
+        accounts.append(account)
+    return accounts
+
+
+def legacy_filter(accounts: list[Account], created_at_strings: list[str], minimum_age: int) -> int:
+    def twitter_account_age(created_at_str: str) -> int:
+        created_at = datetime.strptime(created_at_str, '%a %b %d %H:%M:%S +0000 %Y')
+        return (datetime.utcnow() - created_at).days
+
+    passed = 0
+    for account, created_at_str in zip(accounts, created_at_strings):
+        # Возраст считался в проверке и еще раз для сообщения в лог
+        if twitter_account_age(created_at_str) < minimum_age:
+            twitter_account_age(created_at_str)
+        else:
+            passed += 1
+    return passed
+
+
+def current_filter(accounts: list[Account], minimum_age: int) -> int:
+    # Как в filter_accounts_by_twitter_info: порог считается один раз, без логов
+    cutoff = time.time() - minimum_age * SECONDS_IN_DAY
+    return sum(1 for account in accounts if account.twitter_created_at <= cutoff)
+
+
+def measure(fn, *args) -> tuple[float, int]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--minimum-age", type=int, default=365)
+    args = parser.parse_args()
+
+    accounts = generate_accounts(args.accounts)
+    created_at_strings = [
+        datetime.fromtimestamp(account.twitter_info.created_at, timezone.utc).strftime(TWITTER_DATE_FORMAT)
+        for account in accounts
+    ]
+
+    legacy_time, legacy_passed = measure(legacy_filter, accounts, created_at_strings, args.minimum_age)
+    print(f"legacy  accounts={args.accounts:>7} passed={legacy_passed:>7} {legacy_time:8.3f} s")
+
+    current_time, current_passed = measure(current_filter, accounts, args.minimum_age)
+    print(f"current accounts={args.accounts:>7} passed={current_passed:>7} {current_time:8.3f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Время импорта (холодный старт) по данным python -X importtime.
+
+Модуль импортируется в отдельном процессе несколько раз, выводится медиана
+ и самые тяжелые модули (суммарное время вместе с вложенными импортами).
+
+    python -m benchmarks.import_time --module main --repeat 5 --top 15
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    :return: Суммарное время импорта в микросекундах для каждого модуля.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BASE_DIR, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = max(times.get(name.strip(), 0), int(cumulative))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.repeat)]
+    totals = [run[args.module] for run in runs]
+    print(f"import {args.module}: median {statistics.median(totals) / 1000:.1f} ms,"
+          f" min {min(totals) / 1000:.1f} ms, max {max(totals) / 1000:.1f} ms ({args.repeat} runs)")
+
+    last_run = runs[-1]
+    heaviest = sorted(last_run.items(), key=lambda item: item[1], reverse=True)
+    for name, cumulative in heaviest[1:args.top + 1]:
+        print(f"{cumulative / 1000:9.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Выборки фильтров и статистика меню по AccountIndex.
+
+Раньше каждый фильтр в начале цепочки и подсчет поинтов в меню проходили все аккаунты.
+ Теперь цепочка начинает с самого маленького индекса, а сумма поинтов ведется при сохранении аккаунтов.
+ Меряется отбор аккаунтов для link (есть токен Memeland) и output (кошелек привязан) и сумма поинтов.
+
+    python -m benchmarks.index --accounts 100000 --authorized-fraction 0.01
+"""
+import argparse
+import asyncio
+import random
+import secrets
+import time
+
+from bot.account import Account
+from bot.filters import filter_accounts_by_token, filter_accounts_by_memeland_info
+from bot.index import AccountIndex
+from bot.models import MemelandInfo, MemelandTwitter, MemelandTasks, MemelandPoints
+from bot.pipeline import Pipeline
+
+
+def generate_accounts(count: int, authorized_fraction: float) -> list[Account]:
+    accounts = []
+    for number in range(count):
+        account = Account("0x" + "11" * 32, address="0x0", number=number)
+        account.auth_tokens = {'twitter': secrets.token_hex(20)}
+        if random.random() < authorized_fraction:
+            account.auth_tokens['memeland'] = secrets.token_hex(32)
+            account.memeland_info = MemelandInfo(MemelandTwitter(f"user{number}"), wallet="0x0")
+            account.tasks = MemelandTasks(MemelandPoints(random.randrange(10_000)))
+        accounts.append(account)
+    return accounts
+
+
+def filtered_pipeline() -> Pipeline:
+    # Только фильтры make_output (без сетевых шагов): цепочка возвращает прошедшие аккаунты из batch
+    async def batch(accounts):
+        return None
+
+    pipeline = filter_accounts_by_memeland_info(wallet_is_linked=True, offline=True)(batch)
+    return filter_accounts_by_token("memeland", presence=True)(pipeline)
+
+
+def measure(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--authorized-fraction", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from bot.logger import logger
+    logger.remove()
+
+    accounts = generate_accounts(args.accounts, args.authorized_fraction)
+    index = AccountIndex(accounts)
+    pipeline = filtered_pipeline()
+
+    scan_select = measure(lambda: asyncio.run(pipeline(accounts)), args.repeat)
+    index_select = measure(lambda: asyncio.run(pipeline(index)), args.repeat)
+    scan_points = measure(lambda: sum(account.points for account in accounts if account.points), args.repeat)
+    index_points = measure(lambda: index.total_points, args.repeat)
+
+    print(f"accounts={args.accounts} authorized={index.count([('memeland_token', True)])}")
+    print(f"{'':<8} {'select, ms':>11} {'points, ms':>11}")
+    print(f"{'scan':<8} {scan_select * 1000:>11.3f} {scan_points * 1000:>11.3f}")
+    print(f"{'index':<8} {index_select * 1000:>11.3f} {index_points * 1000:>11.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Make output по сохраненной информации (OFFLINE_OUTPUT).
+
+Раньше make_output перед записью good.txt проходил все аккаунты через ensure_memeland_info
+ (сессия и, при отсутствии информации, запросы к Memeland для каждого аккаунта).
+ Теперь свежая информация берется из хранилища, запросы идут только для устаревшей,
+ а строки пишутся в файл по мере обхода. Бенчмарк считает попытки HTTP запросов через общий пул сессий:
+ на каждый аккаунт с устаревшей информацией их две (user/info и user/tasks). Сеть не используется:
+ каждая попытка завершается ошибкой соединения, такие аккаунты пропускаются.
+
+    python -m benchmarks.output --accounts 100000 --stale-fraction 0.1
+"""
+import argparse
+import asyncio
+import os
+import random
+import secrets
+import tempfile
+import time
+
+import aiohttp
+
+
+def generate_accounts(count: int, stale_fraction: float, max_age_hours: float) -> list:
+    from bot.account import Account, SECONDS_IN_HOUR
+    from bot.models import MemelandInfo, MemelandTwitter
+
+    accounts = []
+    now = time.time()
+    for number in range(count):
+        account = Account("0x" + secrets.token_hex(32), address="0x" + secrets.token_hex(20), number=number)
+        account.auth_tokens = {'twitter': secrets.token_hex(20), 'memeland': secrets.token_hex(32)}
+        account.memeland_info = MemelandInfo(MemelandTwitter(f"user{number}"), wallet=account._address)
+        age_hours = max_age_hours * (2 if random.random() < stale_fraction else 0.5)
+        account.fetched_at = {'memeland_info': now - age_hours * SECONDS_IN_HOUR}
+        accounts.append(account)
+    return accounts
+
+
+async def run(args):
+    from bot.config import load_config
+    from bot.logger import logger
+    from bot.paths import init_paths, REGISTERED_TXT
+    from bot.session import SessionPool, set_session_pool, close_session_pool
+    from bot.output import make_output
+
+    init_paths()
+    config = load_config()
+    config.OFFLINE_OUTPUT = True
+    config.OUTPUT_INFO_MAX_AGE_HOURS = args.max_age_hours
+    config.MAX_RETRIES = 0
+    config.MEMELAND_REQUESTS_PER_SECOND = 0
+    logger.remove()
+
+    http_requests = 0
+
+    class CountingRequest(aiohttp.ClientRequest):
+        def __init__(self, *request_args, **request_kwargs):
+            nonlocal http_requests
+            http_requests += 1
+            raise aiohttp.ClientConnectionError("Бенчмарк не использует сеть")
+
+    set_session_pool(SessionPool(request_class=CountingRequest))
+    accounts = generate_accounts(args.accounts, args.stale_fraction, args.max_age_hours)
+    stale = sum(1 for account in accounts if account.is_stale("memeland_info", args.max_age_hours * 3600))
+
+    started_at = time.perf_counter()
+    try:
+        report = await make_output(accounts)
+    finally:
+        await close_session_pool()
+    seconds = time.perf_counter() - started_at
+
+    with open(REGISTERED_TXT, encoding="utf-8") as file:
+        lines = sum(1 for _ in file)
+    print(f"accounts={args.accounts:>7} written={lines:>7} filtered={report.filtered:>7}"
+          f" stale={stale:>7} http_requests={http_requests} {seconds:8.3f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--stale-fraction", type=float, default=0.1, help="Доля аккаунтов с устаревшей информацией")
+    parser.add_argument("--max-age-hours", type=float, default=24)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Рабочие папки читаются из окружения при импорте bot.paths
+        os.environ["MEMELAND_WORK_DIR"] = work_dir
+        asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
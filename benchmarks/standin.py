@@ -0,0 +1,244 @@
+"""
+Локальный стенд вместо memefarm-api.memecoin.org и Twitter.
+
+Отвечает на те запросы, которые делают MemelandAPI и TwitterAPI (better_automation),
+ с настраиваемой задержкой и долей ошибок (503 с HTML) и 429 (с Retry-After).
+ Токены Memeland - JWT со сроком действия --token-ttl, на истекший токен стенд отвечает 401.
+ Запросы скрипта перенаправляются на стенд через StandinRequest (см. SessionPool.request_class):
+ хост и путь исходного URL становятся путем на стенде, лимиты и трассировка видят исходный URL.
+
+    python -m benchmarks.standin --port 8642 --latency 0.05 --error-rate 0.01 --rate-limited-rate 0.01
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import secrets
+import time
+from dataclasses import dataclass, field
+
+import aiohttp
+from aiohttp import web
+from yarl import URL
+
+STANDIN_HOSTS = ("twitter.com", "api.twitter.com", "memefarm-api.memecoin.org")
+
+TWITTER_CREATED_AT = "Wed Oct 10 20:19:24 +0000 2018"
+TASK_POINTS = 1000
+
+
+def standin_request_class(base_url: str | URL) -> type[aiohttp.ClientRequest]:
+    """
+    :return: ClientRequest, который отправляет запросы к STANDIN_HOSTS на стенд по адресу base_url.
+    """
+    base_url = URL(base_url)
+
+    class StandinRequest(aiohttp.ClientRequest):
+        def __init__(self, method: str, url: URL, *args, **kwargs):
+            if url.host in STANDIN_HOSTS:
+                url = base_url.with_path(f"/{url.host}{url.path}").with_query(url.query)
+            super().__init__(method, url, *args, **kwargs)
+
+    return StandinRequest
+
+
+def generate_records(count: int, prefix: str = "standin") -> dict[str, dict]:
+    """
+    Синтетические записи аккаунтов: случайные ключи и адреса (без вывода адреса из ключа).
+    """
+    records = {}
+    for number in range(count):
+        token = f"{prefix}{number:07d}{secrets.token_hex(8)}"
+        records[token] = {
+            'wallet': {'private_key': "0x" + secrets.token_hex(32), 'address': "0x" + secrets.token_hex(20)},
+            'auth_tokens': {'twitter': token},
+            'memeland_info': None,
+            'memeland_tasks_info': None,
+            'twitter_info': None,
+            'twitter_status': "UNKNOWN",
+        }
+    return records
+
+
+@dataclass
+class StandinAccount:
+    username: str
+    wallet: str | None = None
+    completed: set[str] = field(default_factory=set)
+
+
+@dataclass
+class StandinOptions:
+    latency: float = 0.05
+    latency_jitter: float = 0.5  # Доля от latency
+    error_rate: float = 0.0
+    rate_limited_rate: float = 0.0
+    retry_after: float = 1.0
+    token_ttl: float = 0.0  # Срок действия токенов Memeland, сек. (0 - бессрочные)
+
+
+class Standin:
+    TASKS = ("followMemeland", "shareMessage", "twitterName")
+    TIMELY_TASKS = ("followMemecoin", )
+
+    def __init__(self, options: StandinOptions):
+        self.options = options
+        self._accounts: dict[str, StandinAccount] = {}
+        self.requests_count = 0
+
+    def _account(self, twitter_token: str) -> StandinAccount:
+        if twitter_token not in self._accounts:
+            self._accounts[twitter_token] = StandinAccount(f"standin_{twitter_token[-8:]}")
+        return self._accounts[twitter_token]
+
+    def _issue_memeland_token(self, twitter_token: str) -> str:
+        # JWT без подписи: sub - токен Твиттера, exp - срок действия
+        payload = {'sub': twitter_token}
+        if self.options.token_ttl:
+            payload['exp'] = int(time.time() + self.options.token_ttl)
+        encoded_payload = base64.urlsafe_b64encode(json.dumps(payload).encode()).rstrip(b"=").decode()
+        return f"eyJhbGciOiJub25lIn0.{encoded_payload}.standin"
+
+    def _memeland_account(self, request: web.Request) -> StandinAccount | None:
+        """
+        :return: Аккаунт по токену Memeland или None, если токен не действует.
+        """
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        try:
+            payload = token.split(".")[1]
+            payload = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        except (IndexError, ValueError):
+            return None
+        if "exp" in payload and payload["exp"] < time.time():
+            return None
+        return self._account(payload["sub"])
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        self.requests_count += 1
+        options = self.options
+        if options.latency:
+            jitter = options.latency * options.latency_jitter
+            await asyncio.sleep(max(0.0, random.uniform(options.latency - jitter, options.latency + jitter)))
+
+        is_memeland = request.path.startswith("/memefarm-api.")
+        if (is_memeland and request.path != "/memefarm-api.memecoin.org/user/twitter-auth"
+                and self._memeland_account(request) is None):
+            return web.json_response({"status": 401, "error": "Unauthorized"}, status=401)
+        if random.random() < options.rate_limited_rate:
+            headers = {"Retry-After": f"{options.retry_after:g}"}
+            if is_memeland:
+                return web.json_response({"status": 429, "error": "Too Many Requests"}, status=429, headers=headers)
+            return web.json_response(
+                {"errors": [{"code": 88, "message": "Rate limit exceeded."}]}, status=429, headers=headers)
+        if random.random() < options.error_rate:
+            return web.Response(status=503, text="<html><body>Service Unavailable</body></html>",
+                                content_type="text/html")
+        return await handler(request)
+
+    # Twitter
+
+    async def twitter_authorize(self, request: web.Request) -> web.Response:
+        twitter_token = request.cookies.get("auth_token", "")
+        response = web.json_response({} if request.method == "POST" else {'auth_code': f"code-{twitter_token}"})
+        response.set_cookie("ct0", secrets.token_hex(16))
+        return response
+
+    async def twitter_settings(self, request: web.Request) -> web.Response:
+        account = self._account(request.cookies.get("auth_token", ""))
+        return web.json_response({'screen_name': account.username})
+
+    async def twitter_user_by_screen_name(self, request: web.Request) -> web.Response:
+        return web.json_response({'data': {'user': {'result': {
+            'rest_id': str(random.randrange(10 ** 17, 10 ** 18)),
+            'legacy': {'created_at': TWITTER_CREATED_AT, 'followers_count': 100},
+        }}}})
+
+    async def twitter_follow(self, request: web.Request) -> web.Response:
+        user_id = request.query.get("user_id", "0")
+        return web.json_response({'id': int(user_id), 'id_str': user_id})
+
+    # Memeland
+
+    async def memeland_twitter_auth(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        twitter_token = payload["code"].removeprefix("code-")
+        self._account(twitter_token)
+        return web.json_response({'accessToken': self._issue_memeland_token(twitter_token)})
+
+    async def memeland_info(self, request: web.Request) -> web.Response:
+        account = self._memeland_account(request)
+        return web.json_response({'twitter': {'username': account.username}, 'wallet': account.wallet})
+
+    async def memeland_tasks(self, request: web.Request) -> web.Response:
+        account = self._memeland_account(request)
+        return web.json_response({
+            'points': {'current': len(account.completed) * TASK_POINTS},
+            'tasks': [{'id': task_id, 'completed': task_id in account.completed} for task_id in self.TASKS],
+            'timely': [{'id': task_id, 'completed': task_id in account.completed} for task_id in self.TIMELY_TASKS],
+        })
+
+    async def memeland_link_wallet(self, request: web.Request) -> web.Response:
+        account = self._memeland_account(request)
+        payload = await request.json()
+        if account.wallet:
+            return web.json_response({'status': "reward_already_claimed"})
+        account.wallet = payload["address"]
+        return web.json_response({'status': "success"})
+
+    async def memeland_verify(self, request: web.Request) -> web.Response:
+        account = self._memeland_account(request)
+        endpoint = request.match_info["endpoint"]
+        if endpoint == "twitter-follow":
+            task_id = (await request.json())["followId"]
+        else:
+            task_id = {"share-message": "shareMessage", "twitter-name": "twitterName"}.get(endpoint, endpoint)
+        if task_id in account.completed:
+            return web.json_response({'status': "reward_already_claimed"})
+        account.completed.add(task_id)
+        return web.json_response({'status': "success"})
+
+    def create_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.middleware])
+        app.router.add_route("*", "/twitter.com/i/api/2/oauth2/authorize", self.twitter_authorize)
+        app.router.add_get("/api.twitter.com/1.1/account/settings.json", self.twitter_settings)
+        app.router.add_get("/twitter.com/i/api/graphql/G3KGOASz96M-Qu0nwmGXNg/UserByScreenName",
+                           self.twitter_user_by_screen_name)
+        app.router.add_post("/twitter.com/i/api/1.1/friendships/create.json", self.twitter_follow)
+        app.router.add_post("/memefarm-api.memecoin.org/user/twitter-auth", self.memeland_twitter_auth)
+        app.router.add_get("/memefarm-api.memecoin.org/user/info", self.memeland_info)
+        app.router.add_get("/memefarm-api.memecoin.org/user/tasks", self.memeland_tasks)
+        app.router.add_post("/memefarm-api.memecoin.org/user/verify/link-wallet", self.memeland_link_wallet)
+        app.router.add_post("/memefarm-api.memecoin.org/user/verify/{endpoint}", self.memeland_verify)
+        return app
+
+
+def add_standin_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=0.05, help="Средняя задержка ответа, сек.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 503 (HTML)")
+    parser.add_argument("--rate-limited-rate", type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After в ответах 429, сек.")
+    parser.add_argument("--token-ttl", type=float, default=0.0,
+                        help="Срок действия токенов Memeland, сек. (0 - бессрочные), с истекшим токеном ответ 401")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8642)
+    add_standin_arguments(parser)
+    args = parser.parse_args()
+
+    options = StandinOptions(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limited_rate=args.rate_limited_rate,
+        retry_after=args.retry_after,
+        token_ttl=args.token_ttl,
+    )
+    web.run_app(Standin(options).create_app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == '__main__':
+    main()
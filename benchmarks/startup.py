@@ -0,0 +1,88 @@
+"""
+Время запуска: сопоставление токенов из auth_tokens.txt с хранилищем аккаунтов.
+
+Старая реализация (TinyDB, полный проход по файлу на каждый токен) сравнивается
+ с текущей extract_or_create_accounts (один проход по хранилищу, индекс токен -> запись).
+ Старая реализация квадратичная, поэтому для нее по умолчанию берется меньше токенов.
+
+    python -m benchmarks.startup --tokens 50000 --legacy-tokens 5000 --new-tokens 5000
+"""
+import argparse
+import secrets
+import tempfile
+import time
+from pathlib import Path
+
+from better_web3 import Wallet
+from tinydb import TinyDB, Query
+
+from bot.account import extract_or_create_accounts
+from bot.crypto import shutdown_executor
+from bot.storage import open_storage, close_storages
+
+
+def generate_records(count: int) -> dict[str, dict]:
+    records = {}
+    for _ in range(count):
+        token = secrets.token_hex(20)
+        records[token] = {
+            'wallet': {'private_key': secrets.token_hex(32), 'address': ''},
+            'auth_tokens': {'twitter': token},
+            'memeland_info': None,
+            'memeland_tasks_info': None,
+            'twitter_info': None,
+            'twitter_status': "UNKNOWN",
+        }
+    return records
+
+
+def legacy_extract(twitter_auth_tokens: list[str], db_path: Path) -> int:
+    db = TinyDB(db_path)
+    DBAccount = Query()
+    count = 0
+    for token in twitter_auth_tokens:
+        account_data = db.get(DBAccount['auth_tokens']['twitter'] == token)
+        Wallet.from_key(account_data['wallet']['private_key']) if account_data else Wallet.generate()
+        count += 1
+    db.close()
+    return count
+
+
+def measure(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=50_000)
+    parser.add_argument("--legacy-tokens", type=int, default=5_000)
+    parser.add_argument("--new-tokens", type=int, default=0, help="Токены, которых еще нет в хранилище")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+
+        legacy_records = generate_records(args.legacy_tokens)
+        legacy_db_path = tmp_dir / "accounts.json"
+        db = TinyDB(legacy_db_path)
+        db.insert_multiple(legacy_records.values())
+        db.close()
+        legacy_time = measure(legacy_extract, list(legacy_records), legacy_db_path)
+        print(f"legacy  tokens={args.legacy_tokens:>7} {legacy_time:8.2f} s")
+
+        records = generate_records(args.tokens)
+        db_path = tmp_dir / "accounts.db"
+        storage = open_storage(db_path)
+        storage.upsert_many(records)
+        storage.flush()
+        new_tokens = [secrets.token_hex(20) for _ in range(args.new_tokens)]
+        indexed_time = measure(extract_or_create_accounts, list(records) + new_tokens, db_path)
+        print(f"indexed tokens={args.tokens:>7} new={args.new_tokens:>7} {indexed_time:8.2f} s")
+        close_storages()
+        shutdown_executor()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Пропускная способность модулей на локальном стенде (см. benchmarks.standin).
+
+Стенд запускается отдельным процессом. Для каждого количества аккаунтов запускается отдельный
+ процесс-исполнитель с чистыми рабочими папками (MEMELAND_WORK_DIR): он создает синтетические
+ аккаунты и прогоняет модули по очереди, как python main.py run.
+ Для каждого модуля выводится скорость (акк./сек.), p50/p99 времени обработки одного аккаунта
+ (вместе с повторами), количество HTTP запросов и пиковая память процесса-исполнителя (пик с начала процесса).
+
+    python -m benchmarks.throughput --accounts 1000 10000 100000 --max-tasks 100 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.standin import add_standin_arguments
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_MODULES = ("auth", "link", "tasks", "output")
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[round(fraction * 100) - 1]
+
+
+async def run_worker(args):
+    from bot.paths import init_paths, ACCOUNTS_DB
+    from bot.config import load_config
+    from bot.logger import logger
+    from bot.storage import open_storage, close_storages
+    from bot.account import extract_or_create_accounts
+    from bot.index import AccountIndex, set_account_index
+    from bot.crypto import shutdown_executor
+    from bot.session import SessionPool, set_session_pool, close_session_pool
+    from bot.journal import open_journal, close_journal
+    from bot.ratelimit import get_rate_limiter
+    from bot.metrics import get_metrics
+    import bot.process
+    from benchmarks.standin import generate_records, standin_request_class
+    from main import MODULES
+
+    init_paths()
+    config = load_config()
+    config.MAX_TASKS = args.max_tasks
+    config.MAX_TASKS_PER_PROXY = args.max_tasks
+    config.DEFAULT_PROXY = None
+    config.RETRY_BASE_DELAY = args.retry_base_delay
+    config.PROGRESS_INTERVAL = 0
+    config.MEMELAND_TOKEN_REFRESH_HOURS = args.token_refresh_hours
+    if not args.keep_rate_limits:
+        config.MEMELAND_REQUESTS_PER_SECOND = 0
+        config.TWITTER_REQUESTS_PER_SECOND = 0
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    storage = open_storage(ACCOUNTS_DB)
+    records = generate_records(args.worker_accounts)
+    storage.upsert_many(records)
+    storage.flush()
+    # Как load_accounts в main.py: модули получают AccountIndex
+    accounts = AccountIndex(extract_or_create_accounts(list(records), ACCOUNTS_DB))
+    set_account_index(accounts)
+
+    # Те же трассировки, что у get_session_pool: их накладные расходы входят в замер
+    set_session_pool(SessionPool(
+        limit=config.CONNECTION_LIMIT,
+        keepalive_timeout=config.KEEPALIVE_TIMEOUT,
+        trace_configs=[get_rate_limiter().create_trace_config(), get_metrics().create_trace_config()],
+        request_class=standin_request_class(args.standin_url),
+    ))
+
+    # Время обработки аккаунта: сумма всех попыток
+    durations: dict[int, float] = {}
+    process_account_with_proxy = bot.process.process_account_with_proxy
+
+    async def timed_process_account_with_proxy(account, *fn_args, **fn_kwargs):
+        started_at = time.perf_counter()
+        try:
+            await process_account_with_proxy(account, *fn_args, **fn_kwargs)
+        finally:
+            durations[id(account)] = durations.get(id(account), 0.0) + time.perf_counter() - started_at
+
+    bot.process.process_account_with_proxy = timed_process_account_with_proxy
+
+    try:
+        for module_name in args.modules:
+            durations.clear()
+            get_metrics().reset()
+            open_journal(module_name)
+            started_at = time.perf_counter()
+            try:
+                report = await MODULES[module_name](accounts)
+            finally:
+                close_journal()
+            seconds = time.perf_counter() - started_at
+            values = sorted(durations.values())
+            # Модули только из локальных фильтров (output) проходят без обработки аккаунтов по одному
+            processed = len(values) or report.succeeded
+            print(json.dumps({
+                'module': module_name,
+                'accounts': len(accounts),
+                'processed': processed,
+                'seconds': round(seconds, 3),
+                'accounts_per_second': round(processed / seconds, 1) if processed and seconds else 0.0,
+                'p50': round(percentile(values, 0.5), 4),
+                'p99': round(percentile(values, 0.99), 4),
+                'requests': sum(get_metrics().requests.values()),
+                'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                'failed': report.failed,
+                'errors': dict(report.errors),
+            }), flush=True)
+    finally:
+        await close_session_pool()
+        close_storages()
+        shutdown_executor()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Стенд не запустился на порту {port}")
+
+
+def run_benchmark(args):
+    port = free_port()
+    standin = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.standin", "--port", str(port),
+         "--latency", str(args.latency), "--error-rate", str(args.error_rate),
+         "--rate-limited-rate", str(args.rate_limited_rate), "--retry-after", str(args.retry_after),
+         "--token-ttl", str(args.token_ttl)],
+        cwd=BASE_DIR,
+    )
+    try:
+        wait_for_port(port)
+        print(f"{'module':<8} {'accounts':>8} {'acc/s':>8} {'p50, s':>8} {'p99, s':>8} {'requests':>8}"
+              f" {'RSS, MB':>8} {'failed':>7}")
+        for accounts_count in args.accounts:
+            with tempfile.TemporaryDirectory() as work_dir:
+                worker = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.throughput", "--worker",
+                     "--worker-accounts", str(accounts_count),
+                     "--standin-url", f"http://127.0.0.1:{port}",
+                     "--max-tasks", str(args.max_tasks),
+                     "--retry-base-delay", str(args.retry_base_delay),
+                     "--token-refresh-hours", str(args.token_refresh_hours),
+                     "--log-level", args.log_level,
+                     *(["--keep-rate-limits"] if args.keep_rate_limits else []),
+                     "--modules", *args.modules],
+                    cwd=BASE_DIR, env={**os.environ, "MEMELAND_WORK_DIR": work_dir},
+                    stdout=subprocess.PIPE, text=True, check=True,
+                )
+            for line in worker.stdout.splitlines():
+                result = json.loads(line)
+                print(f"{result['module']:<8} {result['accounts']:>8} {result['accounts_per_second']:>8}"
+                      f" {result['p50']:>8} {result['p99']:>8} {result['requests']:>8}"
+                      f" {result['peak_rss_mb']:>8} {result['failed']:>7}"
+                      + (f"  {result['errors']}" if result['errors'] else ""))
+    finally:
+        standin.terminate()
+        standin.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--modules", nargs="+", default=list(DEFAULT_MODULES))
+    parser.add_argument("--max-tasks", type=int, default=100)
+    parser.add_argument("--retry-base-delay", type=float, default=0.5)
+    parser.add_argument("--token-refresh-hours", type=float, default=1,
+                        help="MEMELAND_TOKEN_REFRESH_HOURS (вместе с --token-ttl стенда)")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Не отключать лимиты запросов из конфига")
+    parser.add_argument("--log-level", default="ERROR")
+    add_standin_arguments(parser)
+    # Параметры процесса-исполнителя
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-accounts", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--standin-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(run_worker(args))
+    else:
+        run_benchmark(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,68 @@
-from datetime import datetime
+import base64
+import json
+import time
 from pathlib import Path
-from typing import Iterable, Literal
+from typing import Iterable, Literal, TYPE_CHECKING
 
 import pyuseragents
 from better_proxy import Proxy
-from better_web3 import Wallet
-from tinydb import TinyDB, Query
+
+from bot.crypto import generate_key_pairs
+from bot.index import get_account_index
+from bot.logger import logger
+from bot.models import MemelandInfo, MemelandTasks, TwitterUser, from_dict, to_dict
+from bot.storage import open_storage
+
+if TYPE_CHECKING:
+    from better_web3 import Wallet
 
 
 TwitterStatus = Literal["UNKNOWN", "BAD_TOKEN", "BANNED", "LOCKED", "GOOD"]
+# Статусы, которые не проверяются повторно
+FINAL_TWITTER_STATUSES: tuple[TwitterStatus, ...] = ("BAD_TOKEN", "BANNED")
+# Блоки данных аккаунта, для которых запоминается время получения
+DataBlock = Literal["twitter_status", "twitter_info", "memeland_info"]
+
+SECONDS_IN_HOUR = 60 * 60
+SECONDS_IN_DAY = 24 * SECONDS_IN_HOUR
 
 
 class Account:
     def __init__(
             self,
-            wallet: Wallet,
+            private_key: str,
             *,
+            address: str = None,
             proxy: Proxy = None,
             number: int = None,
     ):
-        self.wallet = wallet
+        self.private_key = private_key
+        self._address = address
+        self._wallet: "Wallet | None" = None
         self.proxy = proxy
         self.number = number
         self.useragent = pyuseragents.random()
         self.auth_tokens: dict[str: str] = {}  # twitter, twitter_ct0, memeland
-        self.memeland_info: dict | None = None
-        self.tasks: dict | None = None
-        self.twitter_info: dict | None = None
+        self.memeland_info: MemelandInfo | None = None
+        self.tasks: MemelandTasks | None = None
+        self.twitter_info: TwitterUser | None = None
         self.twitter_status: TwitterStatus = "UNKNOWN"
+        self.fetched_at: dict[DataBlock, float] = {}  # Unix time получения блока данных
+
+    @property
+    def wallet(self) -> "Wallet":
+        # Вывод ключа — дорогая операция, а кошелек нужен не каждому модулю.
+        #  Импорт better_web3 (web3, eth_account) сам по себе занимает около секунды
+        if self._wallet is None:
+            from better_web3 import Wallet
+            self._wallet = Wallet.from_key(self.private_key)
+        return self._wallet
+
+    @property
+    def address(self) -> str:
+        if self._address is None:
+            self._address = self.wallet.address
+        return self._address
 
     @property
     def short_twitter_auth_token(self) -> str:
@@ -42,81 +77,169 @@ class Account:
     def save(self, db_path: str | Path):
         save_account(self, db_path)
 
+    def mark_fetched(self, block: DataBlock):
+        self.fetched_at[block] = time.time()
+
+    def is_stale(self, block: DataBlock, max_age: float) -> bool:
+        """
+        :param max_age: Максимальный возраст данных в секундах. 0 - данные не устаревают.
+        :return: Устарели ли данные. Данные, сохраненные до появления отметок времени, считаются устаревшими.
+        """
+        if max_age <= 0:
+            return False
+        return time.time() - self.fetched_at.get(block, 0) > max_age
+
+    @property
+    def memeland_token_expires_at(self) -> int | None:
+        if "memeland" in self.auth_tokens:
+            return jwt_expires_at(self.auth_tokens["memeland"])
+        return None
+
+    def memeland_token_expires_within(self, seconds: float) -> bool:
+        expires_at = self.memeland_token_expires_at
+        return expires_at is not None and expires_at - time.time() <= seconds
+
     @property
     def points(self) -> int | None:
         if self.tasks:
-            return self.tasks["points"]["current"]
+            return self.tasks.points.current
+        return None
+
+    @property
+    def twitter_created_at(self) -> int | None:
+        if self.twitter_info:
+            return self.twitter_info.created_at
         return None
 
     @property
     def twitter_account_age(self) -> int | None:
         if self.twitter_info:
-            created_at_str = self.twitter_info['legacy']['created_at']
-            created_at = datetime.strptime(created_at_str, '%a %b %d %H:%M:%S +0000 %Y')
-            return (datetime.utcnow() - created_at).days
+            return int(time.time() - self.twitter_info.created_at) // SECONDS_IN_DAY
         return None
 
     @property
     def followers_count(self) -> int | None:
         if self.twitter_info:
-            return self.twitter_info['legacy']['followers_count']
+            return self.twitter_info.followers_count
         return None
 
     @property
     def wallet_is_linked(self) -> bool | None:
         if self.memeland_info:
-            return bool(self.memeland_info["wallet"])
+            return bool(self.memeland_info.wallet)
         return None
 
 
-def save_account(account: Account, db_path: str | Path):
-    db = TinyDB(db_path)
-    DBAccount = Query()
+def jwt_expires_at(token: str) -> int | None:
+    """
+    :return: Unix time истечения JWT (поле exp) или None, если это не JWT или срока нет.
+    """
+    try:
+        payload = token.split(".")[1]
+        exp = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))["exp"]
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+    return int(exp) if isinstance(exp, (int, float)) else None
+
 
-    account_data = {
+def account_to_record(account: Account) -> dict:
+    return {
         'wallet': {
-            'private_key': account.wallet.private_key,
-            'address': account.wallet.address,
+            'private_key': account.private_key,
+            'address': account.address,
         },
         'auth_tokens': account.auth_tokens,
-        'memeland_info': account.memeland_info,
-        'memeland_tasks_info': account.tasks,
-        'twitter_info': account.twitter_info,
+        'memeland_info': to_dict(account.memeland_info),
+        'memeland_tasks_info': to_dict(account.tasks),
+        'twitter_info': to_dict(account.twitter_info),
         'twitter_status': account.twitter_status,
+        'fetched_at': account.fetched_at,
     }
 
+
+def save_account(account: Account, db_path: str | Path):
     twitter_token = account.auth_tokens.get('twitter')
     if twitter_token is not None:
-        existing_account = db.search(DBAccount['auth_tokens']['twitter'] == twitter_token)
-        if existing_account:
-            db.update(account_data, DBAccount['auth_tokens']['twitter'] == twitter_token)
-        else:
-            db.insert(account_data)
+        open_storage(db_path).upsert(twitter_token, account_to_record(account))
+        get_account_index().update(account)
     else:
-        print("Twitter token is not set. Account is not saved.")
+        logger.warning("Twitter token is not set. Account is not saved.")
+
+
+def needs_compaction(record: dict) -> bool:
+    """
+    Записи, сохраненные до проекции twitter_info, хранят полный объект пользователя
+     и дату создания аккаунта строкой.
+    """
+    twitter_info = record.get('twitter_info')
+    return bool(twitter_info) and ('legacy' in twitter_info or isinstance(twitter_info.get('created_at'), str))
+
+
+def account_from_record(record: dict, *, number: int = None) -> Account:
+    account = Account(
+        record['wallet']['private_key'],
+        address=record['wallet'].get('address'),
+        number=number,
+    )
+    account.auth_tokens = record['auth_tokens']
+    account.memeland_info = from_dict(MemelandInfo, record.get('memeland_info'))
+    account.tasks = from_dict(MemelandTasks, record.get('memeland_tasks_info'))
+    account.twitter_info = from_dict(TwitterUser, record.get('twitter_info'))
+    account.twitter_status = record.get('twitter_status')
+    account.fetched_at = record.get('fetched_at', {})
+    return account
 
 
 def extract_or_create_accounts(
         twitter_auth_tokens: Iterable[str],
         db_path: str | Path,
 ) -> list[Account]:
-    db = TinyDB(db_path)
-    DBAccount = Query()
+    """
+    Загружает хранилище один раз и сопоставляет с ним токены.
+     Повторяющиеся токены объединяются, кошельки создаются только для новых токенов
+     (пачкой, в пуле процессов), новые аккаунты сразу сохраняются одной пачкой.
+     Кошельки существующих аккаунтов создаются лениво, см. Account.wallet.
+    """
+    storage = open_storage(db_path)
+    token_to_record = storage.load_all()
+    compacted_records = {}
+
+    twitter_auth_tokens = list(twitter_auth_tokens)
+    unique_tokens = list(dict.fromkeys(twitter_auth_tokens))
+    duplicates_count = len(twitter_auth_tokens) - len(unique_tokens)
+    if duplicates_count:
+        logger.warning(f"Повторяющихся токенов: {duplicates_count}. Дубликаты объединены")
+
+    new_tokens_count = sum(1 for token in unique_tokens if token not in token_to_record)
+    key_pairs = iter(generate_key_pairs(new_tokens_count))
 
     accounts = []
-    for i, token in enumerate(twitter_auth_tokens):
-        account_data = db.get(DBAccount['auth_tokens']['twitter'] == token)
-        wallet = Wallet.from_key(account_data['wallet']['private_key']) if account_data else Wallet.generate()
-        account = Account(
-            wallet=wallet,
-            number=i
-        )
-        account.auth_tokens = account_data['auth_tokens'] if account_data else {'twitter': token}
-        if account_data:
-            account.memeland_info = account_data.get('memeland_info')
-            account.tasks = account_data.get('memeland_tasks_info')
-            account.twitter_info = account_data.get('twitter_info')
-            account.twitter_status = account_data.get('twitter_status')
+    new_records = {}
+    for i, token in enumerate(unique_tokens):
+        if token in token_to_record:
+            record = token_to_record[token]
+            account = account_from_record(record, number=i)
+            if needs_compaction(record):
+                compacted_records[token] = account_to_record(account)
+        else:
+            private_key, address = next(key_pairs)
+            account = Account(private_key, address=address, number=i)
+            account.auth_tokens = {'twitter': token}
+            new_records[token] = account_to_record(account)
         accounts.append(account)
 
+    if new_records:
+        storage.upsert_many(new_records)
+        logger.info(f"Новых аккаунтов: {len(new_records)}")
+
+    # Записи токенов, которых сейчас нет в auth_tokens.txt, тоже сжимаются
+    for token, record in token_to_record.items():
+        if token not in compacted_records and needs_compaction(record):
+            compacted_records[token] = account_to_record(account_from_record(record))
+
+    if compacted_records:
+        storage.upsert_many(compacted_records)
+        storage.compact()
+        logger.info(f"Сжато записей в хранилище: {len(compacted_records)}")
+
     return accounts
@@ -1,12 +1,63 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Iterator
+
 import aiohttp
 from better_automation.http import BetterHTTPClient
+from multidict import CIMultiDictProxy
 from yarl import URL
 
+from bot.models import MemelandInfo, MemelandTasks, parse_json
+
+
+def parse_retry_after(headers: CIMultiDictProxy) -> float | None:
+    """
+    :return: Сколько секунд сервер просит подождать (заголовок Retry-After в секундах или HTTP дата).
+    """
+    retry_after = headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass
+class RequestsCount:
+    value: int = 0
+
+
+# Счетчик запросов к Memeland текущего аккаунта: общий для всех MemelandAPI, созданных при его обработке
+_requests_count: ContextVar[RequestsCount | None] = ContextVar("memeland_requests_count", default=None)
+
+
+@contextmanager
+def count_memeland_requests() -> Iterator[RequestsCount]:
+    requests_count = RequestsCount()
+    token = _requests_count.set(requests_count)
+    try:
+        yield requests_count
+    finally:
+        _requests_count.reset(token)
+
 
 class MemelandAPIError(Exception):
-    def __init__(self, code: int, message: str):
+    def __init__(self, code: int, message: str, retry_after: float = None):
         self.code = code
         self.message = message
+        self.retry_after = retry_after
         super().__init__(f"(code={self.code}) {self.message}")
 
 
@@ -16,9 +67,23 @@ class MemelandAPI(BetterHTTPClient):
         'referer': 'https://www.memecoin.org/',
     }
 
-    def __init__(self, session: aiohttp.ClientSession, auth_token: str = None, **kwargs):
-        super().__init__(session, headers=self.DEFAULT_HEADERS, **kwargs)
+    def __init__(
+            self,
+            session: aiohttp.ClientSession,
+            auth_token: str = None,
+            *,
+            reauthorize: Callable[[], Awaitable[str]] = None,
+            **kwargs,
+    ):
+        """
+        :param reauthorize: Выпускает новый токен. Вызывается один раз, если на запрос пришел ответ 401:
+         запрос повторяется с новым токеном. Одновременные запросы, получившие 401, ждут тот же перевыпуск.
+        """
+        super().__init__(session, headers=dict(self.DEFAULT_HEADERS), **kwargs)
         self._auth_token = None
+        self._reauthorize = reauthorize
+        self._reauthorization: asyncio.Future[str] | None = None
+        self._rejected_auth_token: str | None = None
         if auth_token:
             self.set_auth_token(auth_token)
 
@@ -30,28 +95,71 @@ class MemelandAPI(BetterHTTPClient):
         self._auth_token = auth_token
         self._headers.update({'authorization': f"Bearer {auth_token}"})
 
+    def reset_auth_token(self):
+        self._auth_token = None
+        self._headers.pop('authorization', None)
+
+    def set_reauthorize(self, reauthorize: Callable[[], Awaitable[str]] | None):
+        self._reauthorize = reauthorize
+
+    async def _reissue_auth_token(self) -> str:
+        self.reset_auth_token()
+        auth_token = await self._reauthorize()
+        self.set_auth_token(auth_token)
+        return auth_token
+
+    async def _reauthorized_token(self, rejected_auth_token: str | None) -> str | None:
+        """
+        :return: Новый токен вместо отклоненного или None, если перевыпуск невозможен или уже не помог.
+        """
+        if self._reauthorization is None:
+            if self._reauthorize is None:
+                return None
+            self._rejected_auth_token = rejected_auth_token
+            self._reauthorization = asyncio.ensure_future(self._reissue_auth_token())
+        elif rejected_auth_token != self._rejected_auth_token:
+            # Отклонен уже новый токен: повторной авторизации больше не будет
+            return None
+        return await self._reauthorization
+
     async def request(self, method: str, url, **kwargs):
+        auth_token = self._auth_token
+        try:
+            return await self._request(method, url, **kwargs)
+        except MemelandAPIError as e:
+            if e.code != 401:
+                raise
+            if await self._reauthorized_token(auth_token) is None:
+                raise
+            return await self._request(method, url, **kwargs)
+
+    async def _request(self, method: str, url, **kwargs):
+        account_requests_count = _requests_count.get()
+        if account_requests_count is not None:
+            account_requests_count.value += 1
         response = await super().request(method, url, **kwargs)
 
         if response.status in (409, 401, 429):
             response_json = await response.json()
             code = response_json["status"]
             message = response_json["error"]
-            raise MemelandAPIError(code, message)
+            raise MemelandAPIError(code, message, parse_retry_after(response.headers))
+
+        # Вместо ответа может прийти HTML страница балансировщика
+        if response.status >= 500:
+            raise MemelandAPIError(response.status, response.reason, parse_retry_after(response.headers))
 
         return response
 
-    async def request_tasks(self) -> dict:
+    async def request_tasks(self) -> MemelandTasks:
         url = "https://memefarm-api.memecoin.org/user/tasks"
         response = await self.request("GET", url)
-        response_json = await response.json()
-        return response_json
+        return parse_json(MemelandTasks, await response.read())
 
-    async def request_info(self) -> dict:
+    async def request_info(self) -> MemelandInfo:
         url = "https://memefarm-api.memecoin.org/user/info"
         response = await self.request("GET", url)
-        response_json = await response.json()
-        return response_json
+        return parse_json(MemelandInfo, await response.read())
 
     async def link_wallet(self, address: str, message: str, signed_message: str):
         url = "https://memefarm-api.memecoin.org/user/verify/link-wallet"
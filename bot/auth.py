@@ -7,7 +7,7 @@ from bot.api import MemelandAPI
 
 from bot.account import Account
 from bot.logger import LoggingLevel, logger
-from bot.paths import ACCOUNTS_JSON
+from bot.paths import ACCOUNTS_DB
 
 
 @asynccontextmanager
@@ -22,6 +22,32 @@ async def authenticated_twitter(
     account.auth_tokens["twitter_ct0"] = twitter.ct0
 
 
+MEMELAND_BIND_DATA = {
+    'response_type': 'code',
+    'client_id': 'ZXh0SU5iS1pwTE5xclJtaVNNSjk6MTpjaQ',
+    'redirect_uri': 'https://www.memecoin.org/farming',
+    'scope': 'users.read tweet.read offline.access',
+    'state': 'state',
+    'code_challenge': 'challenge',
+    'code_challenge_method': 'plain'
+}
+
+
+async def issue_memeland_token(
+        twitter: TwitterAPI,
+        memeland: MemelandAPI,
+        account: Account,
+) -> str:
+    """
+    Привязка приложения Memeland к Твиттеру и получение нового токена Memeland.
+    """
+    bind_code = await twitter.bind_app(**MEMELAND_BIND_DATA)
+    auth_token = await memeland.request_auth_token(bind_code)
+    account.auth_tokens["memeland"] = auth_token
+    account.save(ACCOUNTS_DB)
+    return auth_token
+
+
 async def auth_memeland(
         session: aiohttp.ClientSession,
         twitter: TwitterAPI,
@@ -31,23 +57,18 @@ async def auth_memeland(
     memeland = MemelandAPI(session, useragent=account.useragent)
 
     if "memeland" not in account.auth_tokens:
-        bind_data = {
-            'response_type': 'code',
-            'client_id': 'ZXh0SU5iS1pwTE5xclJtaVNNSjk6MTpjaQ',
-            'redirect_uri': 'https://www.memecoin.org/farming',
-            'scope': 'users.read tweet.read offline.access',
-            'state': 'state',
-            'code_challenge': 'challenge',
-            'code_challenge_method': 'plain'
-        }
-
-        bind_code = await twitter.bind_app(**bind_data)
-        auth_token = await memeland.request_auth_token(bind_code)
-        account.auth_tokens["memeland"] = auth_token
-        account.save(ACCOUNTS_JSON)
+        await issue_memeland_token(twitter, memeland, account)
         logger.log(logging_level, f"{account} Успешная авторизация")
+    elif account.memeland_token_expires_within(0):
+        await issue_memeland_token(twitter, memeland, account)
+        logger.info(f"{account} Токен Memeland истек и перевыпущен")
+
+    async def reauthorize() -> str:
+        logger.info(f"{account} Токен Memeland не принят (401), повторная авторизация")
+        return await issue_memeland_token(twitter, memeland, account)
 
     memeland.set_auth_token(account.auth_tokens["memeland"])
+    memeland.set_reauthorize(reauthorize)
     return memeland
 
 
@@ -58,4 +79,5 @@ async def authenticated_memeland(
         logging_level: LoggingLevel = "DEBUG"
 ) -> MemelandAPI:
     async with authenticated_twitter(session, account) as twitter:
-        yield await auth_memeland(session, twitter, account, logging_level)
+        memeland = await auth_memeland(session, twitter, account, logging_level)
+        yield memeland
@@ -1,4 +1,7 @@
-from better_automation.utils import load_toml
+import tomllib
+from pathlib import Path
+from typing import Literal
+
 from pydantic import BaseModel
 
 from bot.logger import LoggingLevel
@@ -7,10 +10,27 @@ from bot.paths import CONFIG_TOML
 
 class Config(BaseModel):
     LOGGING_LEVEL: LoggingLevel = "INFO"
+    LOG_FORMAT: Literal["text", "json"] = "text"  # json - файл лога в JSONL, одна запись на строку
+    LOG_FILE_BUFFERING: int = 65536  # Буфер файла лога в байтах (1 - запись после каждой строки)
+    CONSOLE_SUMMARY_INTERVAL: float = 0  # Больше 0 - вместо строки на аккаунт сводка по шагам раз в столько секунд
     IGNORE_WARNINGS: bool = False
     # DELAY_RANGE: tuple[int, int] = (0, 0)
     MAX_TASKS: int = 5
     MAX_TASKS_PER_PROXY: int = 5
+    # Лимиты запросов в секунду (0 - без ограничения) и сколько запросов подряд можно сделать без ожидания
+    MEMELAND_REQUESTS_PER_SECOND: float = 5
+    MEMELAND_REQUESTS_BURST: int = 10
+    TWITTER_REQUESTS_PER_SECOND: float = 10
+    TWITTER_REQUESTS_BURST: int = 20
+    MAX_RETRIES: int = 3  # Сколько раз повторять аккаунт после временной ошибки (429, HTML вместо ответа, сеть)
+    RETRY_BASE_DELAY: float = 5
+    RETRY_MAX_DELAY: float = 300
+    PROGRESS_INTERVAL: float = 10  # Как часто (в секундах) писать в лог скорость обработки аккаунтов (0 - не писать)
+    CONNECTION_LIMIT: int = 100  # Максимум открытых соединений на один прокси
+    CONNECTION_LIMIT_PER_HOST: int = 0  # 0 - без ограничения
+    KEEPALIVE_TIMEOUT: float = 30
+    DNS_CACHE_TTL: int = 300
+    SAVE_INTERVAL: float = 1.0  # Как часто (в секундах) изменения аккаунтов записываются на диск
 
     DEFAULT_PROXY: str | None = None  # Должен быть типа Proxy
     CHANGE_PROXY_URL: str | None = None
@@ -20,8 +40,47 @@ class Config(BaseModel):
 
     NFT: str | None = None
 
+    # Сохранять полные ответы Twitter о пользователе в data/twitter_raw.jsonl (в хранилище остаются только нужные поля)
+    ARCHIVE_RAW_TWITTER_INFO: bool = False
+
+    # Через сколько часов данные аккаунта считаются устаревшими и запрашиваются заново (0 - не устаревают)
+    TWITTER_STATUS_MAX_AGE_HOURS: float = 0  # BAD_TOKEN и BANNED не проверяются повторно
+    TWITTER_INFO_MAX_AGE_HOURS: float = 0
+    MEMELAND_INFO_MAX_AGE_HOURS: float = 0
+    # Make output по сохраненной информации: запросы только для аккаунтов без информации
+    #  или с информацией старше OUTPUT_INFO_MAX_AGE_HOURS
+    OFFLINE_OUTPUT: bool = False
+    OUTPUT_INFO_MAX_AGE_HOURS: float = 24
+    # Токен Memeland, который истекает раньше чем через столько часов, перевыпускается перед запросами модуля
+    MEMELAND_TOKEN_REFRESH_HOURS: float = 1
+
     MINIMUM_ACCOUNT_AGE_IN_DAYS: int = 30
     MINIMUM_FOLLOWERS_COUNT: int = 3
 
 
-CONFIG = Config(**load_toml(CONFIG_TOML))
+_config: Config | None = None
+
+
+def load_config(config_toml: str | Path = CONFIG_TOML) -> Config:
+    global _config
+    with open(config_toml, "rb") as file:
+        _config = Config(**tomllib.load(file))
+    return _config
+
+
+def get_config() -> Config:
+    if _config is None:
+        load_config()
+    return _config
+
+
+class _LazyConfig:
+    """
+    Конфиг читается при первом обращении к настройке, а не при импорте модуля.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_config(), name)
+
+
+CONFIG: Config = _LazyConfig()  # type: ignore[assignment]
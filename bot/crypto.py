@@ -0,0 +1,162 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+
+
+# Меньше этого количества ключей выгоднее сгенерировать в текущем процессе
+PARALLEL_THRESHOLD = 256
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Общий пул процессов для CPU-bound операций с ключами. Создается при первом обращении.
+    """
+    global _executor
+    if _executor is None:
+        # spawn: дочерние процессы не наследуют через fork потоки и открытые соединения event loop
+        _executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(cancel_futures=True)
+        _executor = None
+
+
+def _split(items: list, chunks_count: int) -> list[list]:
+    chunk_size = -(-len(items) // chunks_count)
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def _generate_key_pairs(count: int) -> list[tuple[str, str]]:
+    from better_web3 import Wallet
+
+    key_pairs = []
+    for _ in range(count):
+        wallet = Wallet.generate()
+        key_pairs.append((wallet.private_key, wallet.address))
+    return key_pairs
+
+
+def generate_key_pairs(count: int) -> list[tuple[str, str]]:
+    """
+    Генерирует пары (приватный ключ, адрес). Большие партии распределяются по пулу процессов.
+    """
+    if count < PARALLEL_THRESHOLD:
+        return _generate_key_pairs(count)
+
+    workers_count = os.cpu_count() or 1
+    chunk_sizes = [len(chunk) for chunk in _split(list(range(count)), workers_count)]
+    key_pairs = []
+    for chunk in get_executor().map(_generate_key_pairs, chunk_sizes):
+        key_pairs.extend(chunk)
+    return key_pairs
+
+
+def build_link_message(address: str, twitter_username: str) -> str:
+    return (f"This wallet willl be dropped $MEME from your harvested MEMEPOINTS."
+            f" If you referred friends, family, lovers or strangers, ensure this wallet has the NFT you referred."
+            f"\n\nBut also..."
+            f"\n\nNever gonna give you up"
+            f"\nNever gonna let you down"
+            f"\nNever gonna run around and desert you"
+            f"\nNever gonna make you cry"
+            f"\nNever gonna say goodbye"
+            f"\nNever gonna tell a lie and hurt you"
+            f"\n\nWallet: {address[:5]}...{address[-4:]}\nX account: @{twitter_username}")
+
+
+def _sign_link_messages(items: list[tuple[str, str, str]]) -> list[tuple[str, str]]:
+    from better_web3 import Wallet
+
+    signed_messages = []
+    for private_key, address, twitter_username in items:
+        message = build_link_message(address, twitter_username)
+        signed_messages.append((message, Wallet.from_key(private_key).sign_message(message)))
+    return signed_messages
+
+
+# (address, twitter_username) -> (message, signed_message)
+_link_signatures: dict[tuple[str, str], asyncio.Future] = {}
+
+
+def _forget_signatures(chunk: list[tuple[str, str, str]]):
+    # Неудачная подпись не кешируется: следующая попытка подпишет заново
+    for _, address, twitter_username in chunk:
+        _link_signatures.pop((address, twitter_username), None)
+
+
+async def _sign_chunk(chunk: list[tuple[str, str, str]], futures: list[asyncio.Future]):
+    loop = asyncio.get_running_loop()
+    try:
+        signed_messages = await loop.run_in_executor(get_executor(), _sign_link_messages, chunk)
+    except Exception as exc:
+        _forget_signatures(chunk)
+        for future in futures:
+            future.set_exception(exc)
+            # Подпись могут так и не запросить (аккаунт отсеян дальше по цепочке):
+            #  ошибка помечается полученной, чтобы asyncio не писал о ней в лог
+            future.exception()
+        return
+    for future, signed_message in zip(futures, signed_messages):
+        future.set_result(signed_message)
+
+
+def _register_signatures(
+        items: Iterable[tuple[str, str, str]],
+) -> tuple[list[tuple[str, str, str]], list[asyncio.Future]]:
+    loop = asyncio.get_running_loop()
+    chunk, futures = [], []
+    for private_key, address, twitter_username in items:
+        key = (address, twitter_username)
+        if key in _link_signatures:
+            continue
+        future = loop.create_future()
+        _link_signatures[key] = future
+        chunk.append((private_key, address, twitter_username))
+        futures.append(future)
+    return chunk, futures
+
+
+async def presign_link_messages(items: Iterable[tuple[str, str, str]]):
+    """
+    Подписывает сообщения привязки кошелька для пачки аккаунтов в пуле процессов.
+    :param items: Тройки (приватный ключ, адрес, Twitter username).
+     Уже подписанные или подписываемые пары (адрес, username) пропускаются.
+    """
+    chunk, futures = _register_signatures(items)
+    if not chunk:
+        return
+
+    chunks_count = min(len(chunk), (os.cpu_count() or 1) * 4)
+    chunk_size = -(-len(chunk) // chunks_count)
+    try:
+        await asyncio.gather(*(
+            _sign_chunk(chunk[i:i + chunk_size], futures[i:i + chunk_size])
+            for i in range(0, len(chunk), chunk_size)
+        ))
+    except asyncio.CancelledError:
+        # Неподписанные при отмене пары не должны навсегда остаться в кеше ожидающими
+        for item, future in zip(chunk, futures):
+            if not future.done():
+                _forget_signatures([item])
+                future.cancel()
+        raise
+
+
+async def sign_link_message(private_key: str, address: str, twitter_username: str) -> tuple[str, str]:
+    """
+    :return: Сообщение привязки кошелька и подпись. Повторный запрос берется из кеша.
+    """
+    future = _link_signatures.get((address, twitter_username))
+    if future is None:
+        chunk, futures = _register_signatures([(private_key, address, twitter_username)])
+        await _sign_chunk(chunk, futures)
+        future = futures[0]
+    return await future
@@ -1,175 +1,215 @@
-from typing import Iterable
+import time
+from typing import Callable, Iterable, get_args
 
 import aiohttp
 
-from bot.account import Account, TwitterStatus
-from bot.auth import authenticated_memeland, authenticated_twitter
-from bot.process import process_accounts_with_session
+from bot.account import Account, TwitterStatus, FINAL_TWITTER_STATUSES, SECONDS_IN_DAY, SECONDS_IN_HOUR
+from bot.api import MemelandAPI
+from bot.auth import authenticated_memeland, authenticated_twitter, issue_memeland_token
+from bot.index import INDEXED_TOKENS
+from bot.pipeline import Pipeline, Step, Filter, as_pipeline
 from bot.logger import logger
 from bot.config import CONFIG
 from bot.update_info import update_memeland_info, update_twitter_info, update_twitter_status
 
 
+def _needs_twitter_status(account: Account) -> bool:
+    if account.twitter_status == "UNKNOWN":
+        return True
+    if account.twitter_status in FINAL_TWITTER_STATUSES:
+        return False
+    return account.is_stale("twitter_status", CONFIG.TWITTER_STATUS_MAX_AGE_HOURS * SECONDS_IN_HOUR)
+
+
 async def _ensure_twitter_status(
         session: aiohttp.ClientSession,
         account: Account,
 ):
-    async with authenticated_twitter(session, account) as twitter:
-        if account.twitter_status == "UNKNOWN":
+    # Проверка статуса заполняет и информацию об аккаунте: следующий ensure_twitter_info ее не повторяет
+    if _needs_twitter_status(account):
+        async with authenticated_twitter(session, account) as twitter:
             await update_twitter_status(twitter, account, "INFO")
 
 
-def ensure_twitter_status(func):
-    async def wrapper(accounts: Iterable[Account]):
-        await process_accounts_with_session(accounts, _ensure_twitter_status)
-        await func(accounts)
+def ensure_twitter_status(func) -> Pipeline:
+    return as_pipeline(func).with_stages(Step(_ensure_twitter_status))
+
+
+def _needs_twitter_info(account: Account) -> bool:
+    max_age = CONFIG.TWITTER_INFO_MAX_AGE_HOURS * SECONDS_IN_HOUR
+    return not account.twitter_info or account.is_stale("twitter_info", max_age)
 
-    return wrapper
+
+def _needs_memeland_info(account: Account) -> bool:
+    max_age = CONFIG.MEMELAND_INFO_MAX_AGE_HOURS * SECONDS_IN_HOUR
+    return not account.memeland_info or not account.tasks or account.is_stale("memeland_info", max_age)
 
 
 async def _ensure_twitter_info(
         session: aiohttp.ClientSession,
         account: Account,
 ):
-    async with authenticated_twitter(session, account) as twitter:
-        if not account.twitter_info and account.twitter_status == "GOOD":
+    # Запрос только для аккаунтов без информации или с устаревшей информацией
+    if account.twitter_status == "GOOD" and _needs_twitter_info(account):
+        async with authenticated_twitter(session, account) as twitter:
             await update_twitter_info(twitter, account, "DEBUG")
 
 
-def ensure_twitter_info(func):
-    @filter_accounts_by_twitter_status()
-    async def wrapper(accounts: Iterable[Account]):
-        await process_accounts_with_session(accounts, _ensure_twitter_info)
-        await func(accounts)
-
-    return wrapper
+def ensure_twitter_info(func) -> Pipeline:
+    pipeline = as_pipeline(func).with_stages(Step(_ensure_twitter_info))
+    return filter_accounts_by_twitter_status()(pipeline)
 
 
 async def _ensure_memeland_info(
         session: aiohttp.ClientSession,
         account: Account,
 ):
-    if not account.memeland_info or not account.tasks:
+    if _needs_memeland_info(account):
         async with authenticated_memeland(session, account) as memeland:
             await update_memeland_info(memeland, account, "INFO")
 
 
-def ensure_memeland_info(func):
-    async def wrapper(accounts: Iterable[Account]):
-        await process_accounts_with_session(accounts, _ensure_memeland_info)
-        await func(accounts)
+def ensure_memeland_info(func) -> Pipeline:
+    return as_pipeline(func).with_stages(Step(_ensure_memeland_info))
+
+
+async def _ensure_memeland_token(
+        session: aiohttp.ClientSession,
+        account: Account,
+):
+    # Токен, который вот-вот истечет, перевыпускается до запросов модуля, а не после ответа 401
+    if account.memeland_token_expires_within(CONFIG.MEMELAND_TOKEN_REFRESH_HOURS * SECONDS_IN_HOUR):
+        async with authenticated_twitter(session, account) as twitter:
+            await issue_memeland_token(twitter, MemelandAPI(session, useragent=account.useragent), account)
+            logger.info(f"{account} Токен Memeland перевыпущен")
+
 
-    return wrapper
+def ensure_memeland_token(func) -> Pipeline:
+    return as_pipeline(func).with_stages(Step(_ensure_memeland_token))
 
 
 def filter_accounts_by_twitter_status(
         statuses: Iterable[TwitterStatus] = ("GOOD", ),
         blacklist: bool = False,
 ):
-    def decorator(func):
+    def check_status(status: TwitterStatus) -> bool:
+        if blacklist:
+            return status not in statuses
+        return status in statuses
+
+    def check(account: Account) -> bool:
+        return check_status(account.twitter_status)
+
+    def decorator(func) -> Pipeline:
+        pipeline = as_pipeline(func).with_stages(Filter(
+            check,
+            "twitter_status",
+            f"(blacklist={blacklist}, statuses={statuses}) Ни один из аккаунтов не подходит под критерии.",
+            index_keys=[("twitter_status", status) for status in get_args(TwitterStatus) if check_status(status)],
+        ))
+        return ensure_twitter_status(pipeline)
 
-        @ensure_twitter_status
-        async def wrapper(accounts: Iterable[Account]):
-            filtered_accounts = []
-
-            for account in accounts:
-                if blacklist:
-                    if account.twitter_status not in statuses:
-                        filtered_accounts.append(account)
-                else:
-                    if account.twitter_status in statuses:
-                        filtered_accounts.append(account)
-
-            if not filtered_accounts:
-                logger.warning(f"(blacklist={blacklist}, statuses={statuses})"
-                               f" Ни один из аккаунтов не подходит под критерии.")
-
-            await func(filtered_accounts)
+    return decorator
 
-        return wrapper
 
-    return decorator
+def _resolve(value: float | Callable[[], float] | None) -> float | None:
+    return value() if callable(value) else value
 
 
 def filter_accounts_by_twitter_info(
-        minimum_age: int = None,
-        minimum_followers_count: int = None,
+        minimum_age: int | Callable[[], int] = None,
+        minimum_followers_count: int | Callable[[], int] = None,
 ):
-    def decorator(func):
-
-        @ensure_twitter_info
-        async def wrapper(accounts: Iterable[Account]):
-            filtered_accounts = []
-            for account in accounts:
-                is_filtered = False
-
-                if minimum_followers_count and account.followers_count < minimum_followers_count:
-                    logger.warning(f"{account} {account.followers_count} из {minimum_followers_count} подписчиков")
-                    if not CONFIG.IGNORE_WARNINGS:
-                        is_filtered = True
-
-                if minimum_age and account.twitter_account_age < minimum_age:
-                    logger.warning(f"{account} Возраст аккаунта: {account.twitter_account_age} дней")
-                    if not CONFIG.IGNORE_WARNINGS:
-                        is_filtered = True
-
-                if not is_filtered:
-                    filtered_accounts.append(account)
+    """
+    Критерии можно передать функциями (например, lambda: CONFIG.MINIMUM_FOLLOWERS_COUNT):
+     тогда они читаются в начале каждого прохода, а не при импорте модуля.
+    """
+
+    def decorator(func) -> Pipeline:
+        # Критерии и порог возраста считаются один раз за проход, а не для каждого аккаунта
+        age = followers_count = None
+        created_at_cutoff = 0.0
+
+        def prepare():
+            nonlocal age, followers_count, created_at_cutoff
+            age = _resolve(minimum_age)
+            followers_count = _resolve(minimum_followers_count)
+            if age:
+                created_at_cutoff = time.time() - age * SECONDS_IN_DAY
+            stage.empty_message = (f"(minimum_age={age}, minimum_followers_count={followers_count})"
+                                   f" Ни один из аккаунтов не подходит под критерии.")
+
+        def check(account: Account) -> bool:
+            is_filtered = False
+
+            if followers_count and account.followers_count < followers_count:
+                logger.warning(f"{account} {account.followers_count} из {followers_count} подписчиков")
+                if not CONFIG.IGNORE_WARNINGS:
+                    is_filtered = True
 
-            if not filtered_accounts:
-                logger.warning(f"(minimum_age={minimum_age}, minimum_followers_count={minimum_followers_count})"
-                               f" Ни один из аккаунтов не подходит под критерии.")
+            if age and account.twitter_created_at > created_at_cutoff:
+                logger.warning(f"{account} Возраст аккаунта: {account.twitter_account_age} дней")
+                if not CONFIG.IGNORE_WARNINGS:
+                    is_filtered = True
 
-            await func(filtered_accounts)
+            return not is_filtered
 
-        return wrapper
+        stage = Filter(check, "twitter_info", "Ни один из аккаунтов не подходит под критерии.", prepare)
+        return ensure_twitter_info(as_pipeline(func).with_stages(stage))
 
     return decorator
 
 
 def filter_accounts_by_token(token_name: str, *, presence: bool):
-    def decorator(func):
-        async def wrapper(accounts: Iterable[Account]):
-            if not accounts:
-                return
-
-            if presence:
-                filtered_accounts = [account for account in accounts if token_name in account.auth_tokens]
-                log_message = f"No accounts with {token_name} token"
-            else:
-                filtered_accounts = [account for account in accounts if token_name not in account.auth_tokens]
-                log_message = f"All accounts have {token_name} token"
+    def check(account: Account) -> bool:
+        return (token_name in account.auth_tokens) == presence
 
-            if not filtered_accounts:
-                logger.warning(log_message)
-                return
+    def decorator(func) -> Pipeline:
+        if presence:
+            log_message = f"No accounts with {token_name} token"
+        else:
+            log_message = f"All accounts have {token_name} token"
+        index_keys = [(f"{token_name}_token", presence)] if token_name in INDEXED_TOKENS else []
+        return as_pipeline(func).with_stages(Filter(check, f"{token_name}_token", log_message, index_keys=index_keys))
 
-            return await func(filtered_accounts)
+    return decorator
 
-        return wrapper
 
-    return decorator
+def memeland_info_is_fresh(account: Account, max_age_hours: float) -> bool:
+    return account.memeland_info is not None and not account.is_stale("memeland_info", max_age_hours * SECONDS_IN_HOUR)
 
 
 def filter_accounts_by_memeland_info(
         wallet_is_linked: bool = False,
+        *,
+        offline: bool = False,
+        max_age_hours: float | Callable[[], float] = None,
 ):
-    def decorator(func):
-
-        @ensure_memeland_info
-        async def wrapper(accounts: Iterable[Account]):
-            filtered_accounts = []
-            for account in accounts:
-                is_filtered = False
-
-                if account.wallet_is_linked != wallet_is_linked:
-                    is_filtered = True
-
-                if not is_filtered:
-                    filtered_accounts.append(account)
-
-            await func(filtered_accounts)
-
-        return wrapper
+    """
+    :param offline: Проверять только сохраненную информацию, без запросов.
+     Аккаунты без информации или с информацией старше max_age_hours отсеиваются.
+    :param max_age_hours: Для offline. По умолчанию MEMELAND_INFO_MAX_AGE_HOURS.
+    """
+    max_age = 0.0
+
+    def prepare():
+        nonlocal max_age
+        max_age = _resolve(max_age_hours) if max_age_hours is not None else CONFIG.MEMELAND_INFO_MAX_AGE_HOURS
+
+    def check(account: Account) -> bool:
+        return account.wallet_is_linked == wallet_is_linked
+
+    def check_offline(account: Account) -> bool:
+        return memeland_info_is_fresh(account, max_age) and check(account)
+
+    def decorator(func) -> Pipeline:
+        pipeline = as_pipeline(func).with_stages(Filter(
+            check_offline if offline else check,
+            "memeland_info",
+            f"(wallet_is_linked={wallet_is_linked}) Ни один из аккаунтов не подходит под критерии.",
+            prepare if offline else None,
+            index_keys=[("wallet_is_linked", wallet_is_linked)],
+        ))
+        return pipeline if offline else ensure_memeland_info(pipeline)
 
     return decorator
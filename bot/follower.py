@@ -5,7 +5,7 @@ import aiohttp
 
 from bot.account import Account
 from bot.auth import authenticated_twitter
-from bot.process import process_accounts_with_session
+from bot.process import process_accounts_with_session, ProcessingReport
 from bot.config import CONFIG
 from bot.filters import filter_accounts_by_twitter_info
 from better_automation.utils.other import curry_async
@@ -19,7 +19,7 @@ async def _follow(
         account_to: Account,
 ):
     async with authenticated_twitter(session, account) as twitter:
-        await twitter.follow(account_to.twitter_info["rest_id"])
+        await twitter.follow(account_to.twitter_info.rest_id)
         logger.success(f"{account} Подписался на {account_to}")
 
 
@@ -32,8 +32,9 @@ async def print_followers_count(
         logger.info(f"{account} Количество подписчиков теперь: {account.followers_count}")
 
 
-@filter_accounts_by_twitter_info(minimum_age=CONFIG.MINIMUM_ACCOUNT_AGE_IN_DAYS)
-async def follow_accounts(accounts: Iterable[Account]):
+@filter_accounts_by_twitter_info(minimum_age=lambda: CONFIG.MINIMUM_ACCOUNT_AGE_IN_DAYS)
+async def follow_accounts(accounts: Iterable[Account]) -> ProcessingReport:
+    report = ProcessingReport()
     accounts_to_print = []
     for account in accounts:
         follow_count = max(0, CONFIG.MINIMUM_FOLLOWERS_COUNT - account.followers_count)
@@ -41,5 +42,6 @@ async def follow_accounts(accounts: Iterable[Account]):
             accounts_to_print.append(account)
         random_accounts = sample([a for a in accounts if a != account], k=follow_count)
         _follow_to_account = await curry_async(_follow)(account_to=account)
-        await process_accounts_with_session(random_accounts, _follow_to_account)
-    await process_accounts_with_session(accounts_to_print, print_followers_count)
+        report.merge(await process_accounts_with_session(random_accounts, _follow_to_account))
+    report.merge(await process_accounts_with_session(accounts_to_print, print_followers_count))
+    return report
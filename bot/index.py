@@ -0,0 +1,97 @@
+from collections import defaultdict
+from typing import Hashable, Iterable, Iterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bot.account import Account
+
+# Ключ индекса: (поле, значение), например ("twitter_status", "GOOD") или ("memeland_token", True).
+#  Поля совпадают с именами фильтров (см. bot.filters)
+IndexKey = tuple[str, Hashable]
+
+# Токены, по наличию которых ведется индекс
+INDEXED_TOKENS = ("memeland", )
+
+
+def index_keys(account: "Account") -> frozenset[IndexKey]:
+    keys = {
+        ("twitter_status", account.twitter_status),
+        ("wallet_is_linked", account.wallet_is_linked),
+    }
+    keys.update((f"{token_name}_token", token_name in account.auth_tokens) for token_name in INDEXED_TOKENS)
+    return frozenset(keys)
+
+
+class AccountIndex:
+    """
+    Все аккаунты скрипта со вторичными индексами (статус Твиттера, наличие токенов, привязка кошелька)
+     и суммой поинтов. Индексы обновляются при каждом сохранении аккаунта (см. save_account),
+     поэтому выборки фильтров и статистика меню не проходят все аккаунты заново.
+    """
+
+    def __init__(self, accounts: Iterable["Account"] = ()):
+        self._accounts: dict["Account", int] = {}  # Аккаунт -> порядковый номер
+        self._keys: dict["Account", frozenset[IndexKey]] = {}
+        self._points: dict["Account", int] = {}
+        self._buckets: defaultdict[IndexKey, dict["Account", None]] = defaultdict(dict)
+        self.total_points = 0
+        for account in accounts:
+            self.add(account)
+
+    def __iter__(self) -> Iterator["Account"]:
+        return iter(self._accounts)
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def __contains__(self, account: "Account") -> bool:
+        return account in self._accounts
+
+    def add(self, account: "Account"):
+        if account not in self._accounts:
+            self._accounts[account] = len(self._accounts)
+            self._keys[account] = frozenset()
+        self.update(account)
+
+    def update(self, account: "Account"):
+        """
+        Переносит аккаунт между индексами по его текущему состоянию. Аккаунты не из индекса пропускаются.
+        """
+        old_keys = self._keys.get(account)
+        if old_keys is None:
+            return
+        new_keys = index_keys(account)
+        if new_keys != old_keys:
+            for key in old_keys - new_keys:
+                del self._buckets[key][account]
+            for key in new_keys - old_keys:
+                self._buckets[key][account] = None
+            self._keys[account] = new_keys
+
+        points = account.points or 0
+        self.total_points += points - self._points.get(account, 0)
+        self._points[account] = points
+
+    def count(self, keys: Iterable[IndexKey]) -> int:
+        return sum(len(self._buckets.get(key, ())) for key in keys)
+
+    def select(self, keys: Iterable[IndexKey]) -> list["Account"]:
+        """
+        :return: Аккаунты хотя бы с одним из ключей в исходном порядке.
+        """
+        selected = [account for key in keys for account in self._buckets.get(key, ())]
+        return sorted(selected, key=self._accounts.__getitem__)
+
+
+_account_index: AccountIndex | None = None
+
+
+def get_account_index() -> AccountIndex:
+    global _account_index
+    if _account_index is None:
+        _account_index = AccountIndex()
+    return _account_index
+
+
+def set_account_index(index: AccountIndex):
+    global _account_index
+    _account_index = index
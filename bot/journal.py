@@ -0,0 +1,113 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Literal
+
+from bot.logger import logger
+from bot.paths import ACCOUNTS_DB, JOURNAL_DIR
+from bot.storage import open_storage, WriteBehindStorage
+
+StageStatus = Literal["started", "done", "failed"]
+
+
+def token_hash(twitter_token: str) -> str:
+    """
+    Ключ аккаунта в журнале: сам токен в журнал не пишется.
+    """
+    return hashlib.sha256(twitter_token.encode()).hexdigest()[:16]
+
+
+class RunJournal:
+    """
+    Журнал прохода модуля (JSONL): для каждого аккаунта и шага — started, done или failed.
+     Аккаунт указывается хешем Twitter токена (см. token_hash).
+
+    Строки попадают в файл вместе с записью аккаунтов в хранилище (см. WriteBehindStorage.add_flush_listener):
+     шаг отмечается выполненным только тогда, когда его результат уже на диске,
+     поэтому при продолжении (resume) пропущенный шаг не теряет свой результат.
+    """
+
+    def __init__(self, path: str | Path, storage: WriteBehindStorage, *, resume: bool = False):
+        self.path = Path(path)
+        self._storage = storage
+        self._done: set[tuple[str, str]] = set()
+        self._pending: list[str] = []
+        self._lock = Lock()
+
+        if resume:
+            self._done = self._load_done(self.path)
+            logger.info(f"Продолжение по журналу {self.path.name}: выполнено шагов {len(self._done)}")
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+        self._storage.add_flush_listener(self._on_flush)
+
+    @staticmethod
+    def _load_done(path: Path) -> set[tuple[str, str]]:
+        statuses = {}
+        if not path.exists():
+            return set()
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Оборванная последняя строка после аварийного завершения
+                    continue
+                # Строки журналов старого формата (с токеном вместо хеша) не учитываются
+                if 'token_hash' in entry:
+                    statuses[(entry['token_hash'], entry['stage'])] = entry['status']
+        return {key for key, status in statuses.items() if status == "done"}
+
+    def is_done(self, twitter_token: str, stage: str) -> bool:
+        return (token_hash(twitter_token), stage) in self._done
+
+    def record(self, twitter_token: str, stage: str, status: StageStatus):
+        key = token_hash(twitter_token)
+        line = json.dumps({'time': int(time.time()), 'token_hash': key, 'stage': stage, 'status': status})
+        with self._lock:
+            self._pending.append(line + "\n")
+        if status == "done":
+            self._done.add((key, stage))
+
+    def _on_flush(self):
+        # Строки, добавленные до записи хранилища, пишутся только после ее успешного завершения
+        with self._lock:
+            count = len(self._pending)
+
+        def write():
+            with self._lock:
+                lines, self._pending = self._pending[:count], self._pending[count:]
+            self._file.writelines(lines)
+            self._file.flush()
+
+        return write
+
+    def close(self):
+        self._storage.flush()
+        self._storage.remove_flush_listener(self._on_flush)
+        self._file.close()
+
+
+_journal: RunJournal | None = None
+
+
+def open_journal(module_name: str, *, resume: bool = False) -> RunJournal:
+    """
+    Открывает журнал модуля. Без resume журнал прошлого прохода перезаписывается.
+    """
+    global _journal
+    close_journal()
+    _journal = RunJournal(JOURNAL_DIR / f"{module_name}.jsonl", open_storage(ACCOUNTS_DB), resume=resume)
+    return _journal
+
+
+def get_journal() -> RunJournal | None:
+    return _journal
+
+
+def close_journal():
+    global _journal
+    if _journal is not None:
+        _journal.close()
+        _journal = None
@@ -1,9 +1,11 @@
 import logging
-
+import time
+from collections import Counter
 from datetime import datetime
 from pathlib import Path
-from typing import Literal
-from tqdm.asyncio import tqdm
+from queue import SimpleQueue
+from threading import Event, Lock, Thread
+from typing import Callable, Literal, TextIO
 
 from loguru import logger
 
@@ -31,15 +33,152 @@ class InterceptHandler(logging.Handler):
         logger_opt.log(self._get_level(record), record.getMessage())
 
 
+WARNING_LEVEL_NO = logger.level("WARNING").no
+ERROR_LEVEL_NO = logger.level("ERROR").no
+
+
+class QueuedWriter:
+    """
+    Выполняет запись (например, в консоль) в отдельном потоке: вызов logger только кладет строку в очередь.
+    """
+
+    def __init__(self, write: Callable[[str], None]):
+        self._write = write
+        self._queue: SimpleQueue[str | Event | None] = SimpleQueue()
+        self._thread = Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while (message := self._queue.get()) is not None:
+            if isinstance(message, Event):
+                message.set()
+            else:
+                self._write(message)
+
+    def __call__(self, message: str):
+        self._queue.put(message)
+
+    def flush(self):
+        """
+        Ждет, пока будут записаны все сообщения, поставленные в очередь до вызова.
+        """
+        written = Event()
+        self._queue.put(written)
+        written.wait()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class ConsoleSummary:
+    """
+    Консольный вывод для больших прогонов: сообщения ниже WARNING не печатаются по одному,
+     а считаются по шагам (функциям) и печатаются сводкой раз в interval секунд.
+     Предупреждений печатается не больше warnings_per_interval на шаг за интервал, остальные считаются.
+     Ошибки печатаются всегда.
+
+    Используется как filter консольного обработчика: отброшенные сообщения даже не форматируются.
+    """
+
+    def __init__(self, write: Callable[[str], None], interval: float, warnings_per_interval: int = 20):
+        self._write = write
+        self.interval = interval
+        self.warnings_per_interval = warnings_per_interval
+        self._counts: Counter[tuple[str, str]] = Counter()
+        self._warnings: Counter[str] = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = Lock()
+
+    def filter(self, record: dict) -> bool:
+        level = record["level"]
+        function = record["function"]
+        with self._lock:
+            if level.no >= ERROR_LEVEL_NO:
+                passed = True
+            elif level.no >= WARNING_LEVEL_NO:
+                self._warnings[function] += 1
+                passed = self._warnings[function] <= self.warnings_per_interval
+            else:
+                passed = False
+            if not passed:
+                self._counts[(function, level.name)] += 1
+        if time.monotonic() - self._flushed_at >= self.interval:
+            self.flush()
+        return passed
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._warnings.clear()
+            self._flushed_at = time.monotonic()
+        if counts:
+            summary = ", ".join(f"{function} {level}: {count}" for (function, level), count in sorted(counts.items()))
+            self._write(f"{datetime.now().strftime('%H:%M:%S')} | SUMMARY  | {summary}\n")
+
+
+_console_writer: QueuedWriter | None = None
+_console_summary: ConsoleSummary | None = None
+
+
 def setup_logger(
         log_dir: Path,
         console_logging_level: LoggingLevel = "INFO",
         file_logging_level: LoggingLevel = "DEBUG",
+        *,
+        serialize: bool = False,
+        file_buffering: int = 1,
+        console_summary_interval: float = 0,
+        console_stream: TextIO = None,
 ):
+    """
+    Запись в консоль идет в отдельном потоке (QueuedWriter), файл пишется через буфер.
+
+    :param serialize: Писать в файл JSON (одна запись на строку) вместо текста.
+    :param file_buffering: Буфер файла в байтах. 1 — сброс после каждой строки,
+     больше — запись пачками (хвост файла может отставать, пока буфер не заполнится).
+    :param console_summary_interval: Если больше 0, то в консоль вместо сообщений об аккаунтах
+     печатается сводка по шагам раз в столько секунд, см. ConsoleSummary.
+    :param console_stream: Поток для консольных сообщений (по умолчанию stdout).
+     В неинтерактивном режиме — stderr, чтобы в stdout был только итог.
+    """
+    global _console_writer, _console_summary
+    from tqdm.asyncio import tqdm
+
     log_dir.mkdir(exist_ok=True)
-    logger.remove()
-    log_filename = f"{datetime.now().strftime('%d-%m-%Y')}.log"
+    close_logger()
+    log_filename = f"{datetime.now().strftime('%d-%m-%Y')}.{'jsonl' if serialize else 'log'}"
     log_filepath = Path(log_dir, log_filename)
     logging.basicConfig(handlers=[InterceptHandler()], level=logging.DEBUG)
-    logger.add(log_filepath, format=FILE_LOG_FORMAT, level=file_logging_level, rotation='1 day')
-    logger.add(lambda msg: tqdm.write(msg, end=''), colorize=True, format=CONSOLE_LOG_FORMAT, level=console_logging_level)
+    logger.add(log_filepath, format=FILE_LOG_FORMAT, level=file_logging_level, rotation='1 day',
+               serialize=serialize, buffering=file_buffering)
+
+    _console_writer = QueuedWriter(lambda msg: tqdm.write(msg, file=console_stream, end=''))
+    console_filter = None
+    if console_summary_interval > 0:
+        _console_summary = ConsoleSummary(_console_writer, console_summary_interval)
+        console_filter = _console_summary.filter
+    logger.add(_console_writer, colorize=True, format=CONSOLE_LOG_FORMAT, level=console_logging_level,
+               filter=console_filter)
+
+
+def flush_console_summary():
+    """
+    Печатает накопленную сводку (например, в конце модуля) и ждет, пока очередь консоли опустеет.
+    """
+    if _console_summary is not None:
+        _console_summary.flush()
+    if _console_writer is not None:
+        _console_writer.flush()
+
+
+def close_logger():
+    """
+    Печатает оставшиеся сообщения и закрывает файлы (сбрасывая буфер).
+    """
+    global _console_writer, _console_summary
+    flush_console_summary()
+    logger.remove()
+    if _console_writer is not None:
+        _console_writer.close()
+    _console_writer = _console_summary = None
@@ -0,0 +1,165 @@
+import json
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+
+import aiohttp
+
+from bot.logger import logger
+
+# Границы корзин гистограмм, секунды
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUEUE_WAIT_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        result = []
+        total = 0
+        for bound, count in zip((*map(str, self.buckets), "+Inf"), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'sum': round(self.sum, 6), 'buckets': dict(self.cumulative())}
+
+
+def _endpoint(method: str, url) -> str:
+    return f"{method} {url.host}{url.path}"
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+class RequestMetrics:
+    """
+    Метрики запросов ко всем хостам (Memeland, Twitter), собираются через aiohttp.TraceConfig:
+     количество запросов и статусы по эндпоинтам, время до получения заголовков ответа,
+     байты тела запроса и ответа. Плюс время ожидания слота на прокси в AccountScheduler.
+    """
+
+    def __init__(self):
+        self.statuses: Counter[tuple[str, str]] = Counter()
+        self.latency: defaultdict[str, Histogram] = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.bytes_sent: Counter[str] = Counter()
+        self.bytes_received: Counter[str] = Counter()
+        self.queue_wait = Histogram(QUEUE_WAIT_BUCKETS)
+
+    def reset(self):
+        self.__init__()
+
+    @property
+    def requests(self) -> Counter[str]:
+        requests = Counter()
+        for (endpoint, _), count in self.statuses.items():
+            requests[endpoint] += count
+        return requests
+
+    def create_trace_config(self) -> aiohttp.TraceConfig:
+        # Контекст трассировки один на запрос: в нем эндпоинт и время начала
+        trace_config = aiohttp.TraceConfig(trace_config_ctx_factory=lambda **_: SimpleNamespace())
+
+        async def on_request_start(session, context, params: aiohttp.TraceRequestStartParams):
+            context.endpoint = _endpoint(params.method, params.url)
+            context.started_at = time.perf_counter()
+
+        async def on_request_chunk_sent(session, context, params: aiohttp.TraceRequestChunkSentParams):
+            self.bytes_sent[context.endpoint] += len(params.chunk)
+
+        async def on_response_chunk_received(session, context, params: aiohttp.TraceResponseChunkReceivedParams):
+            self.bytes_received[context.endpoint] += len(params.chunk)
+
+        async def on_request_end(session, context, params: aiohttp.TraceRequestEndParams):
+            self.latency[context.endpoint].observe(time.perf_counter() - context.started_at)
+            self.statuses[(context.endpoint, str(params.response.status))] += 1
+
+        async def on_request_exception(session, context, params: aiohttp.TraceRequestExceptionParams):
+            self.latency[context.endpoint].observe(time.perf_counter() - context.started_at)
+            self.statuses[(context.endpoint, type(params.exception).__name__)] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+        trace_config.on_response_chunk_received.append(on_response_chunk_received)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def to_dict(self) -> dict:
+        endpoints = {}
+        for endpoint, count in sorted(self.requests.items()):
+            endpoints[endpoint] = {
+                'requests': count,
+                'statuses': {status: n for (name, status), n in sorted(self.statuses.items()) if name == endpoint},
+                'latency': self.latency[endpoint].to_dict(),
+                'bytes_sent': self.bytes_sent[endpoint],
+                'bytes_received': self.bytes_received[endpoint],
+            }
+        return {'endpoints': endpoints, 'queue_wait': self.queue_wait.to_dict()}
+
+    def to_prometheus(self, module_name: str) -> str:
+        lines = [
+            "# TYPE memeland_requests_total counter",
+            *(f"memeland_requests_total{_labels(module=module_name, endpoint=endpoint, status=status)} {count}"
+              for (endpoint, status), count in sorted(self.statuses.items())),
+            "# TYPE memeland_request_duration_seconds histogram",
+        ]
+        for endpoint, histogram in sorted(self.latency.items()):
+            for bound, count in histogram.cumulative():
+                labels = _labels(module=module_name, endpoint=endpoint, le=bound)
+                lines.append(f"memeland_request_duration_seconds_bucket{labels} {count}")
+            labels = _labels(module=module_name, endpoint=endpoint)
+            lines.append(f"memeland_request_duration_seconds_sum{labels} {histogram.sum:.6f}")
+            lines.append(f"memeland_request_duration_seconds_count{labels} {histogram.count}")
+        lines.append("# TYPE memeland_request_bytes_total counter")
+        for direction, counter in (("sent", self.bytes_sent), ("received", self.bytes_received)):
+            for endpoint, count in sorted(counter.items()):
+                labels = _labels(module=module_name, endpoint=endpoint, direction=direction)
+                lines.append(f"memeland_request_bytes_total{labels} {count}")
+        lines.append("# TYPE memeland_queue_wait_seconds histogram")
+        for bound, count in self.queue_wait.cumulative():
+            lines.append(f"memeland_queue_wait_seconds_bucket{_labels(module=module_name, le=bound)} {count}")
+        lines.append(f"memeland_queue_wait_seconds_sum{_labels(module=module_name)} {self.queue_wait.sum:.6f}")
+        lines.append(f"memeland_queue_wait_seconds_count{_labels(module=module_name)} {self.queue_wait.count}")
+        return "\n".join(lines) + "\n"
+
+    def log(self):
+        for endpoint, count in sorted(self.requests.items()):
+            histogram = self.latency[endpoint]
+            logger.debug(f"{endpoint}: {count} запросов, в среднем {histogram.sum / histogram.count:.3f} сек.")
+        if self.queue_wait.count:
+            logger.debug(f"Ожидание слота на прокси: в среднем {self.queue_wait.sum / self.queue_wait.count:.3f} сек.")
+
+    def dump(self, metrics_dir: str | Path, module_name: str):
+        """
+        Сохраняет метрики модуля в <module>.json и <module>.prom (текстовый формат Prometheus).
+        """
+        metrics_dir = Path(metrics_dir)
+        with open(metrics_dir / f"{module_name}.json", "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        with open(metrics_dir / f"{module_name}.prom", "w", encoding="utf-8") as file:
+            file.write(self.to_prometheus(module_name))
+
+
+_metrics: RequestMetrics | None = None
+
+
+def get_metrics() -> RequestMetrics:
+    global _metrics
+    if _metrics is None:
+        _metrics = RequestMetrics()
+    return _metrics
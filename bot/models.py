@@ -0,0 +1,110 @@
+from dataclasses import field
+from datetime import datetime
+from functools import cache
+from typing import TypeVar
+
+from pydantic import TypeAdapter, model_validator
+from pydantic.dataclasses import dataclass
+
+
+# Модели хранят только те поля ответов, которые использует скрипт. Остальные поля отбрасываются при разборе
+
+@dataclass(slots=True)
+class MemelandTwitter:
+    username: str
+
+
+@dataclass(slots=True)
+class MemelandInfo:
+    twitter: MemelandTwitter
+    wallet: str | None = None
+
+
+@dataclass(slots=True)
+class MemelandTask:
+    id: str
+    completed: bool
+
+
+@dataclass(slots=True)
+class MemelandPoints:
+    current: int
+
+
+@dataclass(slots=True)
+class MemelandTasks:
+    points: MemelandPoints
+    tasks: list[MemelandTask] = field(default_factory=list)
+    timely: list[MemelandTask] = field(default_factory=list)
+
+
+TWITTER_DATE_FORMAT = '%a %b %d %H:%M:%S %z %Y'
+
+
+def parse_twitter_date(date: str) -> int:
+    """
+    :return: Unix time из даты Twitter ("Wed Oct 10 20:19:24 +0000 2018").
+    """
+    return int(datetime.strptime(date, TWITTER_DATE_FORMAT).timestamp())
+
+
+def project_twitter_user(user: dict) -> dict:
+    """
+    Оставляет от GraphQL объекта пользователя (request_user_info) только используемые поля.
+     Уже спроецированный объект возвращается как есть.
+    """
+    if "legacy" not in user:
+        return user
+    return {
+        'rest_id': user['rest_id'],
+        'created_at': user['legacy']['created_at'],
+        'followers_count': user['legacy']['followers_count'],
+    }
+
+
+@dataclass(slots=True)
+class TwitterUser:
+    rest_id: str
+    created_at: int  # Unix time, разбирается один раз при получении или загрузке
+    followers_count: int
+
+    @model_validator(mode="before")
+    @classmethod
+    def _project(cls, data):
+        if isinstance(data, dict):
+            try:
+                data = project_twitter_user(data)
+                created_at = data['created_at']
+            except KeyError as e:
+                # ValueError pydantic превращает в ValidationError, KeyError ушел бы наверх как есть
+                raise ValueError(f"Нет поля {e} в объекте пользователя (__typename={data.get('__typename')})")
+            if isinstance(created_at, str):
+                data = {**data, 'created_at': parse_twitter_date(data['created_at'])}
+        return data
+
+
+Model = TypeVar("Model")
+
+
+@cache
+def _adapter(model_type: type[Model]) -> TypeAdapter[Model]:
+    return TypeAdapter(model_type)
+
+
+def parse_json(model_type: type[Model], data: bytes | str) -> Model:
+    """
+    Разбирает JSON сразу в модель (парсер pydantic-core), минуя промежуточный dict.
+    """
+    return _adapter(model_type).validate_json(data)
+
+
+def from_dict(model_type: type[Model], data: dict | None) -> Model | None:
+    if data is None:
+        return None
+    return _adapter(model_type).validate_python(data)
+
+
+def to_dict(model) -> dict | None:
+    if model is None:
+        return None
+    return _adapter(type(model)).dump_python(model)
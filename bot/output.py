@@ -1,16 +1,85 @@
+import os
 from typing import Iterable
 
-from better_automation.utils.file import write_lines
+import aiohttp
 
 from bot.account import Account
+from bot.auth import authenticated_memeland
 from bot.paths import REGISTERED_TXT
 from bot.logger import logger
-from bot.filters import filter_accounts_by_memeland_info, filter_accounts_by_token
+from bot.config import CONFIG
+from bot.index import AccountIndex
+from bot.pipeline import each_account
+from bot.process import ProcessingReport
+from bot.update_info import update_memeland_info
+from bot.filters import (
+    ensure_memeland_token,
+    filter_accounts_by_memeland_info,
+    filter_accounts_by_token,
+    memeland_info_is_fresh,
+)
 
 
-@filter_accounts_by_token("memeland", presence=True)
-@filter_accounts_by_memeland_info(wallet_is_linked=True)
-async def make_output(accounts: Iterable[Account]):
-    accounts_to_write = [f'{account.auth_tokens["twitter"]}:{account.wallet.private_key}' for account in accounts]
-    write_lines(REGISTERED_TXT, accounts_to_write)
-    logger.success(f"Зарегистрированные аккаунты сохранены по пути {REGISTERED_TXT}")
+async def _write_output(accounts: Iterable[Account]) -> ProcessingReport:
+    # Строки пишутся по мере обхода во временный файл, который затем заменяет good.txt:
+    #  при сбое посередине прошлый good.txt остается целым
+    temp_path = REGISTERED_TXT.with_name(REGISTERED_TXT.name + ".tmp")
+    count = 0
+    with open(temp_path, "w", encoding="utf-8") as file:
+        for account in accounts:
+            file.write(f'{account.auth_tokens["twitter"]}:{account.private_key}\n')
+            count += 1
+    os.replace(temp_path, REGISTERED_TXT)
+    logger.success(f"Зарегистрированные аккаунты ({count}) сохранены по пути {REGISTERED_TXT}")
+    return ProcessingReport(succeeded=count)
+
+
+@ensure_memeland_token
+@each_account
+async def _refresh_memeland_info(
+        session: aiohttp.ClientSession,
+        account: Account,
+):
+    async with authenticated_memeland(session, account) as memeland:
+        await update_memeland_info(memeland, account)
+
+
+_make_output_offline = filter_accounts_by_token("memeland", presence=True)(
+    filter_accounts_by_memeland_info(
+        wallet_is_linked=True,
+        offline=True,
+        max_age_hours=lambda: CONFIG.OUTPUT_INFO_MAX_AGE_HOURS,
+    )(_write_output))
+_make_output_online = filter_accounts_by_token("memeland", presence=True)(
+    ensure_memeland_token(filter_accounts_by_memeland_info(wallet_is_linked=True)(_write_output)))
+
+
+async def make_output(accounts: Iterable[Account]) -> ProcessingReport:
+    """
+    С OFFLINE_OUTPUT свежая информация (OUTPUT_INFO_MAX_AGE_HOURS) берется из хранилища без запросов,
+     запрашивается только информация аккаунтов, у которых ее нет или она устарела.
+    """
+    if not CONFIG.OFFLINE_OUTPUT:
+        return await _make_output_online(accounts)
+
+    if isinstance(accounts, AccountIndex):
+        authorized_accounts = accounts.select([("memeland_token", True)])
+    else:
+        accounts = list(accounts)
+        authorized_accounts = [account for account in accounts if "memeland" in account.auth_tokens]
+
+    max_age_hours = CONFIG.OUTPUT_INFO_MAX_AGE_HOURS
+    report = ProcessingReport()
+    stale_accounts = [account for account in authorized_accounts
+                      if not memeland_info_is_fresh(account, max_age_hours)]
+    if stale_accounts:
+        logger.info(f"Аккаунтов без свежей информации Memeland: {len(stale_accounts)}. Обновление")
+        report.merge(await _refresh_memeland_info(stale_accounts))
+        # Не удалось обновить: в вывод не попадают, хотя по сохраненной информации кошелек привязан
+        skipped_count = sum(1 for account in stale_accounts
+                            if account.wallet_is_linked and not memeland_info_is_fresh(account, max_age_hours))
+        if skipped_count:
+            logger.warning(f"Аккаунтов с привязанным кошельком пропущено из-за устаревшей информации: {skipped_count}")
+
+    report.merge(await _make_output_offline(accounts))
+    return report
@@ -1,32 +1,48 @@
+import os
+import shutil
 from pathlib import Path
-from better_automation.utils import copy_file
 
 
 SCRIPT_DIR = Path(__file__).parent
 BASE_DIR = SCRIPT_DIR.parent
+# Рабочие папки (input, output, data, log) можно вынести отдельно от скрипта, например для бенчмарков
+WORK_DIR = Path(os.environ.get("MEMELAND_WORK_DIR", BASE_DIR))
 
 SETTINGS_DIR = BASE_DIR / "settings"
 CONFIG_DIR = BASE_DIR / "config"
 DEFAULT_CONFIG_DIR = CONFIG_DIR / ".default"
-INPUT_DIR = BASE_DIR / "input"
-OUTPUT_DIR = BASE_DIR / "output"
-DATA_DIR = BASE_DIR / "data"
-LOG_DIR = BASE_DIR / "log"
+INPUT_DIR = WORK_DIR / "input"
+OUTPUT_DIR = WORK_DIR / "output"
+DATA_DIR = WORK_DIR / "data"
+LOG_DIR = WORK_DIR / "log"
 ABI_DIR = SCRIPT_DIR / "abi"
+JOURNAL_DIR = DATA_DIR / "journal"
+METRICS_DIR = DATA_DIR / "metrics"
 
-DIRS = (INPUT_DIR, OUTPUT_DIR, DATA_DIR, LOG_DIR)
-
-for dir in DIRS:
-    dir.mkdir(exist_ok=True)
+DIRS = (INPUT_DIR, OUTPUT_DIR, DATA_DIR, JOURNAL_DIR, METRICS_DIR, LOG_DIR)
 
 TOKENS_TXT = INPUT_DIR / "auth_tokens.txt"
-ACCOUNTS_JSON = DATA_DIR / "accounts.json"
+ACCOUNTS_JSON = DATA_DIR / "accounts.json"  # Старое хранилище, только для миграции
+ACCOUNTS_DB = DATA_DIR / "accounts.db"
+TWITTER_RAW_JSONL = DATA_DIR / "twitter_raw.jsonl"
 REGISTERED_TXT = OUTPUT_DIR / "good.txt"
 
-FILES = (TOKENS_TXT, ACCOUNTS_JSON)
-for file in FILES:
-    file.touch()
+FILES = (TOKENS_TXT, )
 
 DEFAULT_CONFIG_TOML = DEFAULT_CONFIG_DIR / "config.toml"
 CONFIG_TOML = CONFIG_DIR / "config.toml"
-copy_file(DEFAULT_CONFIG_TOML, CONFIG_TOML)
+
+
+def init_paths():
+    """
+    Создает рабочие папки и файлы и копирует конфиг по умолчанию.
+     Вызывается явно при запуске скрипта: импорт модуля ничего не создает.
+    """
+    for dir in DIRS:
+        dir.mkdir(exist_ok=True)
+
+    for file in FILES:
+        file.touch()
+
+    if not CONFIG_TOML.exists():
+        shutil.copy2(DEFAULT_CONFIG_TOML, CONFIG_TOML)
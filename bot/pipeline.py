@@ -0,0 +1,178 @@
+from collections import Counter
+from typing import Awaitable, Callable, Iterable, Sequence
+
+import aiohttp
+
+from bot.account import Account
+from bot.index import AccountIndex, IndexKey
+from bot.journal import get_journal, RunJournal
+from bot.logger import logger
+from bot.process import process_accounts_with_session, ProcessingReport
+
+
+class Step:
+    """
+    Сетевой шаг обработки одного аккаунта: ensure-шаг или действие модуля.
+    """
+
+    def __init__(self, fn: Callable[[aiohttp.ClientSession, Account], Awaitable], name: str = None):
+        self.fn = fn
+        self.name = name or fn.__name__.strip("_")
+
+    async def __call__(self, session: aiohttp.ClientSession, account: Account):
+        await self.fn(session, account)
+
+
+class Filter:
+    """
+    Локальная проверка аккаунта. Аккаунт, не прошедший проверку, дальше по цепочке не идет.
+    :param prepare: Вызывается один раз перед каждым проходом (например, чтобы посчитать пороги).
+    :param index_keys: Ключи AccountIndex, под один из которых попадает каждый прошедший проверку аккаунт.
+    """
+
+    def __init__(
+            self,
+            check: Callable[[Account], bool],
+            name: str,
+            empty_message: str,
+            prepare: Callable[[], None] = None,
+            index_keys: Sequence[IndexKey] = (),
+    ):
+        self.check = check
+        self.name = name
+        self.empty_message = empty_message
+        self.prepare = prepare
+        self.index_keys = tuple(index_keys)
+
+
+Stage = Step | Filter
+
+
+async def _run_step(step: Step, session: aiohttp.ClientSession, account: Account, journal: RunJournal | None):
+    if journal is None:
+        await step(session, account)
+        return
+
+    twitter_token = account.auth_tokens['twitter']
+    if journal.is_done(twitter_token, step.name):
+        return
+    journal.record(twitter_token, step.name, "started")
+    try:
+        await step(session, account)
+    except Exception:
+        journal.record(twitter_token, step.name, "failed")
+        raise
+    journal.record(twitter_token, step.name, "done")
+
+
+class Pipeline:
+    """
+    Цепочка шагов, которая проходится каждым аккаунтом за один проход:
+     аккаунт переходит к следующему шагу сразу, не дожидаясь остальных аккаунтов.
+     Фильтры в начале цепочки применяются сразу, без сессий.
+     Если открыт журнал модуля (см. bot.journal), шаги, выполненные в прошлом проходе, пропускаются.
+
+    :param stages: Шаги в порядке выполнения.
+    :param batch: Асинхронная функция, которая получает все аккаунты, прошедшие цепочку.
+     Если она возвращает ProcessingReport, он добавляется к отчету цепочки.
+    """
+
+    def __init__(self, stages: Sequence[Stage] = (), batch: Callable[[list[Account]], Awaitable] = None):
+        self.stages = tuple(stages)
+        self.batch = batch
+
+    def with_stages(self, *stages: Stage) -> "Pipeline":
+        return Pipeline((*stages, *self.stages), self.batch)
+
+    async def __call__(self, accounts: Iterable[Account]) -> ProcessingReport:
+        stages = list(self.stages)
+        passed_counts = Counter()
+        report = ProcessingReport()
+        journal = get_journal()
+
+        for stage in stages:
+            if isinstance(stage, Filter) and stage.prepare:
+                stage.prepare()
+
+        if isinstance(accounts, AccountIndex):
+            accounts = self._select(accounts, report)
+            if not accounts:
+                return report
+        else:
+            accounts = list(accounts)
+
+        while stages and isinstance(stages[0], Filter):
+            stage = stages.pop(0)
+            accounts_count = len(accounts)
+            accounts = [account for account in accounts if stage.check(account)]
+            report.filtered += accounts_count - len(accounts)
+            if not accounts:
+                logger.warning(stage.empty_message)
+                return report
+
+        passed_accounts = set()
+
+        async def process_account(session: aiohttp.ClientSession, account: Account):
+            for stage in stages:
+                if isinstance(stage, Filter):
+                    if not stage.check(account):
+                        report.filtered += 1
+                        return
+                    passed_counts[stage.name] += 1
+                else:
+                    await _run_step(stage, session, account, journal)
+            passed_accounts.add(id(account))
+
+        if stages:
+            filtered_before_pass = report.filtered
+            report.merge(await process_accounts_with_session(accounts, process_account))
+            # Отфильтрованные по ходу цепочки аккаунты завершились без ошибок, но успешными не считаются
+            report.succeeded -= report.filtered - filtered_before_pass
+
+            for stage in stages:
+                if isinstance(stage, Filter) and not passed_counts[stage.name]:
+                    logger.warning(stage.empty_message)
+                    break
+        else:
+            passed_accounts = {id(account) for account in accounts}
+
+        if self.batch:
+            batch_report = await self.batch([account for account in accounts if id(account) in passed_accounts])
+            if isinstance(batch_report, ProcessingReport):
+                report.merge(batch_report)
+
+        return report
+
+    def _select(self, index: AccountIndex, report: ProcessingReport) -> list[Account]:
+        """
+        Выборка по самому маленькому индексу среди фильтров в начале цепочки:
+         остальные фильтры затем проверяют только ее, а не все аккаунты.
+        """
+        indexed_filters = []
+        for stage in self.stages:
+            if not isinstance(stage, Filter):
+                break
+            if stage.index_keys:
+                indexed_filters.append(stage)
+        if not indexed_filters:
+            return list(index)
+
+        stage = min(indexed_filters, key=lambda stage: index.count(stage.index_keys))
+        accounts = index.select(stage.index_keys)
+        report.filtered += len(index) - len(accounts)
+        if not accounts:
+            logger.warning(stage.empty_message)
+        return accounts
+
+
+def as_pipeline(func) -> Pipeline:
+    if isinstance(func, Pipeline):
+        return func
+    return Pipeline(batch=func)
+
+
+def each_account(fn: Callable[[aiohttp.ClientSession, Account], Awaitable]) -> Pipeline:
+    """
+    Превращает функцию обработки одного аккаунта в модуль-цепочку.
+    """
+    return Pipeline([Step(fn)])
@@ -1,19 +1,83 @@
 import asyncio
-from collections import defaultdict
-from typing import Iterable, Callable
+import random
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Callable, Literal, Sized
 
 import aiohttp
-from aiohttp_socks import ProxyConnector
-from better_automation.process import bounded_gather
 from better_proxy import Proxy
 
 from bot.config import CONFIG
 from bot.logger import logger, LoggingLevel
 from bot.account import Account
-from bot.paths import ACCOUNTS_JSON
+from bot.paths import ACCOUNTS_DB
+from bot.session import get_session_pool
+from bot.metrics import get_metrics
+from bot.update_info import TWITTER_ERROR_STATUSES
 
-from bot.api import MemelandAPIError
-from better_automation.twitter.errors import HTTPException as TwitterException
+from bot.api import MemelandAPIError, count_memeland_requests, parse_retry_after
+from better_automation.twitter.errors import (
+    HTTPException as TwitterException,
+    TooManyRequests as TwitterTooManyRequests,
+    TwitterServerError,
+)
+
+
+ErrorKind = Literal["retryable", "permanent"]
+
+
+def classify_error(exc: Exception) -> ErrorKind:
+    if isinstance(exc, MemelandAPIError):
+        return "retryable" if exc.code == 429 or (isinstance(exc.code, int) and exc.code >= 500) else "permanent"
+    if isinstance(exc, (TwitterTooManyRequests, TwitterServerError)):
+        return "retryable"
+    # ContentTypeError (вместо ответа пришел HTML) тоже ClientError
+    if isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError)):
+        return "retryable"
+    return "permanent"
+
+
+def get_retry_after(exc: Exception) -> float | None:
+    if isinstance(exc, MemelandAPIError):
+        return exc.retry_after
+    if isinstance(exc, TwitterException):
+        return parse_retry_after(exc.response.headers)
+    return None
+
+
+@dataclass
+class ProcessingReport:
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    filtered: int = 0
+    errors: Counter = field(default_factory=Counter)
+
+    def merge(self, other: "ProcessingReport | None"):
+        if other is None:
+            return
+        self.succeeded += other.succeeded
+        self.failed += other.failed
+        self.retries += other.retries
+        self.filtered += other.filtered
+        self.errors.update(other.errors)
+
+    def to_dict(self) -> dict:
+        return {
+            'succeeded': self.succeeded,
+            'failed': self.failed,
+            'retries': self.retries,
+            'filtered': self.filtered,
+            'errors': dict(self.errors),
+        }
+
+    def log(self):
+        logging_level = "INFO" if self.errors else "DEBUG"
+        errors = ", ".join(f"{name}: {count}" for name, count in self.errors.most_common())
+        logger.log(logging_level, f"Итог: успешно {self.succeeded}, с ошибкой {self.failed}, повторов {self.retries}"
+                                  + (f", отфильтровано {self.filtered}" if self.filtered else "")
+                                  + (f" ({errors})" if errors else ""))
 
 
 async def sleep(account, seconds: int, logging_level: LoggingLevel = "DEBUG"):
@@ -29,23 +93,22 @@ async def process_account_with_session(
         account: Account,
         fn: Callable,
 ):
-    try:
-        await fn(session, account)
-    except TwitterException as e:
-        if any(code in e.api_codes for code in (32, )):
-            account.twitter_status = "BAD_TOKEN"
-            account.save(ACCOUNTS_JSON)
-        if any(code in e.api_codes for code in (64, )):
-            account.twitter_status = "BANNED"
-            account.save(ACCOUNTS_JSON)
-        if any(code in e.api_codes for code in (326, )):
-            account.twitter_status = "LOCKED"
-            account.save(ACCOUNTS_JSON)
-    except MemelandAPIError as e:
-        if e.code == 429:
+    with count_memeland_requests() as requests_count:
+        try:
+            await fn(session, account)
+        except TwitterException as e:
+            # Статус сохраняется, а сама ошибка учитывается в отчете (см. AccountScheduler)
+            for code in e.api_codes:
+                if code in TWITTER_ERROR_STATUSES:
+                    account.twitter_status = TWITTER_ERROR_STATUSES[code]
+                    account.mark_fetched("twitter_status")
+                    account.save(ACCOUNTS_DB)
+                    break
             raise
-        logger.warning(f"{account} {e}")
-        return
+        finally:
+            # Один итог на аккаунт за попытку: все шаги цепочки и все клиенты MemelandAPI
+            if requests_count.value:
+                logger.debug(f"{account} Запросов к Memeland: {requests_count.value}")
 
 
 async def process_account_with_proxy(
@@ -54,11 +117,182 @@ async def process_account_with_proxy(
         *,
         proxy: Proxy = None,
 ):
-    connector = ProxyConnector.from_url(proxy.as_url) if proxy else aiohttp.TCPConnector()
-    async with aiohttp.ClientSession(connector=connector) as session:
+    async with get_session_pool().session(proxy) as session:
         await process_account_with_session(session, account, fn)
 
 
+class AccountScheduler:
+    """
+    Пул из max_tasks обработчиков, которые берут аккаунты из ограниченной очереди.
+     Очередь заполняется из итератора лениво, поэтому в памяти одновременно находится
+     O(max_tasks) задач, а не по задаче на каждый аккаунт.
+
+    Ошибка одного аккаунта не прерывает остальные (см. classify_error):
+     retryable — аккаунт возвращается в очередь с экспоненциальной задержкой (или по Retry-After),
+     permanent — аккаунт пропускается и учитывается в отчете как ошибка.
+    """
+
+    def __init__(
+            self,
+            fn: Callable,
+            *,
+            max_tasks: int = 1,
+            max_tasks_per_proxy: int = 1,
+            default_proxy: Proxy = None,
+            progress_interval: float = 10,
+            max_retries: int = 3,
+            retry_base_delay: float = 5,
+            retry_max_delay: float = 300,
+    ):
+        self.fn = fn
+        self.max_tasks = max_tasks
+        self.default_proxy = default_proxy
+        self.progress_interval = progress_interval
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.report = ProcessingReport()
+        self._queue: asyncio.Queue[tuple[Account, int]] = asyncio.Queue(maxsize=max_tasks)
+        self._delayed: set[asyncio.Task] = set()
+        self._proxy_semaphores: defaultdict[Proxy, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(max_tasks_per_proxy))
+        self._total: int | None = None
+        self._pulled = 0
+        self._started_at = 0.0
+
+    @property
+    def processed(self) -> int:
+        return self.report.succeeded + self.report.failed
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Аккаунты, ожидающие обработки: в очереди, ожидающие повтора
+         и еще не взятые из итератора (если их количество известно).
+        """
+        depth = self._queue.qsize() + len(self._delayed)
+        if self._total is not None:
+            depth += self._total - self._pulled
+        return depth
+
+    @property
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self._started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def log_progress(self, logging_level: LoggingLevel = "INFO"):
+        total = f"/{self._total}" if self._total is not None else ""
+        logger.log(logging_level, f"Обработано {self.processed}{total} аккаунтов,"
+                                  f" {self.throughput:.2f} акк./сек., в очереди: {self.queue_depth}")
+
+    async def _produce(self, accounts: Iterator[Account]):
+        for account in accounts:
+            self._pulled += 1
+            await self._queue.put((account, 0))
+
+    def _retry_delay(self, exc: Exception, attempt: int) -> float:
+        delay = min(self.retry_base_delay * 2 ** attempt, self.retry_max_delay)
+        delay += random.uniform(0, delay / 10)
+        retry_after = get_retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    async def _requeue_later(self, account: Account, attempt: int, delay: float):
+        await asyncio.sleep(delay)
+        await self._queue.put((account, attempt))
+
+    def _handle_error(self, account: Account, attempt: int, exc: Exception):
+        kind = classify_error(exc)
+        self.report.errors[type(exc).__name__] += 1
+
+        if kind == "retryable" and attempt < self.max_retries:
+            delay = self._retry_delay(exc, attempt)
+            if isinstance(exc, aiohttp.ContentTypeError):
+                logger.warning(f"{account} Вместо ответа пришел HTML. Повтор через {delay:.1f} сек.")
+            else:
+                logger.warning(f"{account} {exc}. Повтор через {delay:.1f} сек.")
+            task = asyncio.create_task(self._requeue_later(account, attempt + 1, delay))
+            self._delayed.add(task)
+            task.add_done_callback(self._delayed.discard)
+            self.report.retries += 1
+            return
+
+        self.report.failed += 1
+        if kind == "retryable":
+            logger.error(f"{account} {exc}. Попытки исчерпаны")
+        elif isinstance(exc, (MemelandAPIError, TwitterException)):
+            logger.warning(f"{account} {exc}")
+        else:
+            logger.error(f"{account} Непредвиденная ошибка: {exc}")
+            logger.exception(exc)
+
+    async def _process_with_limit(self, account: Account):
+        proxy = account.proxy or self.default_proxy
+        semaphore = self._proxy_semaphores[proxy]
+        started_at = time.perf_counter()
+        async with semaphore:
+            get_metrics().queue_wait.observe(time.perf_counter() - started_at)
+            await process_account_with_proxy(account, self.fn, proxy=proxy)
+
+    async def _work(self):
+        while True:
+            account, attempt = await self._queue.get()
+            try:
+                await self._process_with_limit(account)
+                self.report.succeeded += 1
+            except Exception as exc:
+                self._handle_error(account, attempt, exc)
+            finally:
+                self._queue.task_done()
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            self.log_progress()
+
+    async def _drain(self, producer: asyncio.Task):
+        await producer
+        while True:
+            await self._queue.join()
+            if not self._delayed:
+                break
+            # Отложенный аккаунт попадает в очередь до завершения своей задачи
+            await asyncio.wait(set(self._delayed))
+
+    async def run(self, accounts: Iterable[Account]) -> ProcessingReport:
+        self._total = len(accounts) if isinstance(accounts, Sized) else None
+        self._started_at = time.monotonic()
+        workers_count = min(self.max_tasks, self._total) if self._total is not None else self.max_tasks
+        if not workers_count:
+            return self.report
+
+        producer = asyncio.create_task(self._produce(iter(accounts)))
+        drain = asyncio.create_task(self._drain(producer))
+        workers = [asyncio.create_task(self._work()) for _ in range(workers_count)]
+        tasks = [producer, drain, *workers]
+        if self.progress_interval > 0:
+            tasks.append(asyncio.create_task(self._report_progress()))
+        done = set()
+
+        try:
+            # Обработчики завершаются только из-за ошибки самого планировщика, поэтому первая завершившаяся
+            #  задача — либо опустевшая очередь, либо такая ошибка
+            done, _ = await asyncio.wait([drain, *workers], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (*tasks, *self._delayed):
+                task.cancel()
+            await asyncio.gather(*tasks, *self._delayed, return_exceptions=True)
+
+        for task in done:
+            if task.exception():
+                raise task.exception()
+
+        self.log_progress("DEBUG")
+        self.report.log()
+        return self.report
+
+
 async def process_accounts_with_session(
         accounts: Iterable[Account],
         fn: Callable,
@@ -66,9 +300,9 @@ async def process_accounts_with_session(
         max_tasks: int = 1,
         max_tasks_per_proxy: int = 1,
         default_proxy: Proxy = None,
-):
+) -> ProcessingReport:
     """
-    :param accounts: Аккаунты.
+    :param accounts: Аккаунты. Может быть ленивым итератором: аккаунты берутся из него по мере обработки.
     :param fn: Асинхронная функция для обработки аккаунта.
      Должна принимать первым параметров сессию aiohttp.ClientSession, а вторым - аккаунт.
     :param max_tasks: Максимальное количество одновременно обрабатываемых аккаунтов.
@@ -81,41 +315,16 @@ async def process_accounts_with_session(
     # TODO Осторожно, костыль
     max_tasks = CONFIG.MAX_TASKS
     max_tasks_per_proxy = CONFIG.MAX_TASKS_PER_PROXY
-    default_proxy = Proxy.from_str(CONFIG.DEFAULT_PROXY)
-
-    proxy_to_accounts: dict[Proxy, list[Account]] = defaultdict(list)
-    for account in accounts:
-        proxy = account.proxy or default_proxy
-        proxy_to_accounts[proxy].append(account)
-
-    semaphores: dict[Proxy, asyncio.Semaphore] = {
-        proxy: asyncio.Semaphore(max_tasks_per_proxy) for proxy in proxy_to_accounts
-    }
-    global_semaphore = asyncio.Semaphore(max_tasks)
-
-    async def process_with_limit(account: Account, proxy: Proxy):
-        async with global_semaphore:
-            async with semaphores[proxy]:
-                await process_account_with_proxy(account, fn, proxy=proxy)
-
-    tasks = [
-        asyncio.create_task(process_with_limit(account, proxy))
-        for proxy, accounts_list in proxy_to_accounts.items()
-        for account in accounts_list
-    ]
-
-    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
-
-    # Если какая-то из задач завершилась с ошибкой, прерываем остальные задачи
-    for task in done:
-        exc = task.exception()
-        if isinstance(exc, aiohttp.ContentTypeError):
-            logger.error(f"Вместо ответа пришел HTML. Попробуйте позже")
-        elif isinstance(exc, MemelandAPIError) and exc.code == 429:
-            logger.warning(f"{exc}. Попробуйте позже")
-        elif exc:
-            logger.error(f"Непредвиденная ошибка: {exc}")
-            logger.exception(exc)
-        # Отменяем оставшиеся задачи
-        for p in pending:
-            p.cancel()
+    default_proxy = Proxy.from_str(CONFIG.DEFAULT_PROXY) if CONFIG.DEFAULT_PROXY else None
+
+    scheduler = AccountScheduler(
+        fn,
+        max_tasks=max_tasks,
+        max_tasks_per_proxy=max_tasks_per_proxy,
+        default_proxy=default_proxy,
+        progress_interval=CONFIG.PROGRESS_INTERVAL,
+        max_retries=CONFIG.MAX_RETRIES,
+        retry_base_delay=CONFIG.RETRY_BASE_DELAY,
+        retry_max_delay=CONFIG.RETRY_MAX_DELAY,
+    )
+    return await scheduler.run(accounts)
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import aiohttp
+from yarl import URL
+
+from bot.api import parse_retry_after
+from bot.config import CONFIG
+from bot.logger import logger
+
+
+class TokenBucket:
+    """
+    Клиентский лимит запросов: rate запросов в секунду, не больше burst подряд.
+     После 429 все запросы к хосту ставятся на паузу на время из Retry-After.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        started_at = time.monotonic()
+        # Очередь на замке сохраняет порядок запросов
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+        self.waited += time.monotonic() - started_at
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class RateLimiter:
+    """
+    Общие для всех сессий лимиты по группам хостов (Memeland, Twitter).
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, int]], host_groups: dict[str, str], default_pause: float = 60):
+        # Группа с rate <= 0 не ограничивается
+        self._buckets = {
+            group: TokenBucket(rate, burst) for group, (rate, burst) in limits.items() if rate > 0
+        }
+        self._host_groups = host_groups
+        self._default_pause = default_pause
+
+    def _get_bucket(self, url: URL) -> TokenBucket | None:
+        host = url.host or ""
+        for suffix, group in self._host_groups.items():
+            if host == suffix or host.endswith(f".{suffix}"):
+                return self._buckets.get(group)
+        return None
+
+    async def acquire(self, url: URL):
+        bucket = self._get_bucket(url)
+        if bucket:
+            await bucket.acquire()
+
+    def on_response(self, url: URL, response: aiohttp.ClientResponse):
+        if response.status != 429:
+            return
+        bucket = self._get_bucket(url)
+        if bucket:
+            pause = parse_retry_after(response.headers)
+            bucket.pause(pause if pause is not None else self._default_pause)
+
+    @property
+    def waited(self) -> dict[str, float]:
+        return {group: bucket.waited for group, bucket in self._buckets.items()}
+
+    def log_waited(self):
+        waited = ", ".join(f"{group}: {seconds:.1f} сек." for group, seconds in self.waited.items())
+        logger.debug(f"Ожидание лимитов запросов: {waited}")
+
+    def reset_waited(self):
+        for bucket in self._buckets.values():
+            bucket.waited = 0.0
+
+    def create_trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params: aiohttp.TraceRequestStartParams):
+            await self.acquire(params.url)
+
+        async def on_request_end(session, context, params: aiohttp.TraceRequestEndParams):
+            self.on_response(params.url, params.response)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+
+HOST_GROUPS = {
+    "memecoin.org": "memeland",
+    "twitter.com": "twitter",
+    "x.com": "twitter",
+}
+
+_rate_limiter: RateLimiter | None = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            {
+                "memeland": (CONFIG.MEMELAND_REQUESTS_PER_SECOND, CONFIG.MEMELAND_REQUESTS_BURST),
+                "twitter": (CONFIG.TWITTER_REQUESTS_PER_SECOND, CONFIG.TWITTER_REQUESTS_BURST),
+            },
+            HOST_GROUPS,
+        )
+    return _rate_limiter
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Iterable
 
 import aiohttp
@@ -5,10 +6,14 @@ import aiohttp
 from bot.account import Account
 from bot.api import MemelandAPI
 from bot.auth import authenticated_memeland, authenticated_twitter, auth_memeland
-from bot.process import process_accounts_with_session
+from bot.crypto import presign_link_messages, sign_link_message
+from bot.pipeline import each_account
+from bot.process import ProcessingReport
 from bot.logger import logger, LoggingLevel
 from bot.config import CONFIG
 from bot.filters import (
+    ensure_memeland_info,
+    ensure_memeland_token,
     filter_accounts_by_twitter_info,
     filter_accounts_by_memeland_info,
     filter_accounts_by_token,
@@ -17,7 +22,13 @@ from bot.update_info import update_memeland_info
 from bot.api import MemelandAPIError
 
 
-async def _auth_account(
+@filter_accounts_by_token("memeland", presence=False)
+@filter_accounts_by_twitter_info(
+    minimum_age=lambda: CONFIG.MINIMUM_ACCOUNT_AGE_IN_DAYS,
+    minimum_followers_count=lambda: CONFIG.MINIMUM_FOLLOWERS_COUNT,
+)
+@each_account
+async def auth_accounts(
         session: aiohttp.ClientSession,
         account: Account,
         logging_level: LoggingLevel = "SUCCESS",
@@ -27,24 +38,18 @@ async def _auth_account(
         await update_memeland_info(memeland, account)
 
 
+@filter_accounts_by_token("memeland", presence=True)
+@ensure_memeland_token
+@filter_accounts_by_memeland_info(wallet_is_linked=False)
+@each_account
 async def _link_wallet(
         session: aiohttp.ClientSession,
         account: Account,
         logging_level: LoggingLevel = "SUCCESS",
 ):
-    address = account.wallet.address
-    twitter_username = account.memeland_info["twitter"]["username"]
-    message = (f"This wallet willl be dropped $MEME from your harvested MEMEPOINTS."
-               f" If you referred friends, family, lovers or strangers, ensure this wallet has the NFT you referred."
-               f"\n\nBut also..."
-               f"\n\nNever gonna give you up"
-               f"\nNever gonna let you down"
-               f"\nNever gonna run around and desert you"
-               f"\nNever gonna make you cry"
-               f"\nNever gonna say goodbye"
-               f"\nNever gonna tell a lie and hurt you"
-               f"\n\nWallet: {address[:5]}...{address[-4:]}\nX account: @{twitter_username}")
-    signed_message = account.wallet.sign_message(message)
+    address = account.address
+    twitter_username = account.memeland_info.twitter.username
+    message, signed_message = await sign_link_message(account.private_key, address, twitter_username)
     async with authenticated_memeland(session, account) as memeland:
         response_json = await memeland.link_wallet(address, message, signed_message)
         status = response_json["status"]
@@ -66,19 +71,22 @@ async def _link_wallet(
         logger.log(logging_level, f"{account} {status}")
 
 
-@filter_accounts_by_token("memeland", presence=False)
-@filter_accounts_by_twitter_info(
-    minimum_age=CONFIG.MINIMUM_ACCOUNT_AGE_IN_DAYS,
-    minimum_followers_count=CONFIG.MINIMUM_FOLLOWERS_COUNT,
-)
-async def auth_accounts(accounts: Iterable[Account]):
-    await process_accounts_with_session(accounts, _auth_account)
-
-
-@filter_accounts_by_token("memeland", presence=True)
-@filter_accounts_by_memeland_info(wallet_is_linked=False)
-async def link_wallets(accounts: Iterable[Account]):
-    await process_accounts_with_session(accounts, _link_wallet)
+async def link_wallets(accounts: Iterable[Account]) -> ProcessingReport:
+    # Подписи считаются в пуле процессов параллельно с запросами.
+    #  Аккаунты, о которых еще нет информации, подписываются по мере прохождения цепочки
+    presign_task = asyncio.create_task(presign_link_messages(
+        (account.private_key, account.address, account.memeland_info.twitter.username)
+        for account in accounts
+        if "memeland" in account.auth_tokens and account.wallet_is_linked is False
+    ))
+    try:
+        report = await _link_wallet(accounts)
+    except BaseException:
+        presign_task.cancel()
+        raise
+    finally:
+        await asyncio.gather(presign_task, return_exceptions=True)
+    return report
 
 
 async def _perform_task(
@@ -87,44 +95,54 @@ async def _perform_task(
         task_id: str,
         endpoint: str,
         payload: dict = None,
-) -> None:
+) -> bool:
+    """
+    :return: Изменилась ли информация об аккаунте (нужно ли ее обновить).
+    """
     response_json = await memeland.perform_task(endpoint, payload=payload)
     status = response_json["status"]
     if status == "success":
         logger.success(f"{account} Успешно выполнил таск {task_id}")
-        await update_memeland_info(memeland, account)
+        return True
     elif status in ("reward_already_claimed", "user_already_invited"):
         logger.info(f"{account} Таск {task_id} уже выполнен")
-        await update_memeland_info(memeland, account)
+        return True
     else:
         logger.warning(f"{account} Не удалось выполнить таск {task_id}: {status}")
+        return False
 
 
-async def _complete_tasks(
+@filter_accounts_by_token("memeland", presence=True)
+@ensure_memeland_token
+@ensure_memeland_info
+@each_account
+async def complete_tasks(
         session: aiohttp.ClientSession,
         account: Account,
 ):
-    incomplete_tasks = [task for task in account.tasks["tasks"] + account.tasks["timely"] if not task["completed"]]
+    incomplete_tasks = [task for task in account.tasks.tasks + account.tasks.timely if not task.completed]
 
     if not incomplete_tasks:
         return
 
     async with authenticated_memeland(session, account) as memeland:
-        for task in incomplete_tasks:
-            task_id: str = task["id"]
-
-            if task_id.startswith("follow"):
-                payload = {'followId': task_id}
-                await _perform_task(memeland, account, task_id, "twitter-follow", payload)
-            elif task_id == "shareMessage":
-                await _perform_task(memeland, account, task_id, "share-message")
-            elif task_id == "inviteCode" and CONFIG.NFT:
-                payload = {'code': CONFIG.NFT}
-                await _perform_task(memeland, account, task_id, "invite-code", payload)
-            elif task_id == "twitterName" and "❤️ Memecoin" in account.memeland_info["twitter"]["username"]:
-                await _perform_task(memeland, account, task_id, "twitter-name")
-
-
-@filter_accounts_by_token("memeland", presence=True)
-async def complete_tasks(accounts: Iterable[Account]):
-    await process_accounts_with_session(accounts, _complete_tasks)
+        needs_update = False
+        try:
+            for task in incomplete_tasks:
+                task_id: str = task.id
+
+                if task_id.startswith("follow"):
+                    payload = {'followId': task_id}
+                    needs_update |= await _perform_task(memeland, account, task_id, "twitter-follow", payload)
+                elif task_id == "shareMessage":
+                    needs_update |= await _perform_task(memeland, account, task_id, "share-message")
+                elif task_id == "inviteCode" and CONFIG.NFT:
+                    payload = {'code': CONFIG.NFT}
+                    needs_update |= await _perform_task(memeland, account, task_id, "invite-code", payload)
+                elif task_id == "twitterName" and "❤️ Memecoin" in account.memeland_info.twitter.username:
+                    needs_update |= await _perform_task(memeland, account, task_id, "twitter-name")
+        finally:
+            # Одно обновление после всех тасков вместо обновления после каждого.
+            #  Выполняется и после ошибки, чтобы уже выполненные таски и поинты попали в хранилище
+            if needs_update:
+                await update_memeland_info(memeland, account)
@@ -0,0 +1,145 @@
+from dataclasses import dataclass, asdict
+from typing import Iterable
+
+import aiohttp
+from better_proxy import Proxy
+
+from bot.config import CONFIG
+from bot.logger import logger, LoggingLevel
+from bot.ratelimit import get_rate_limiter
+from bot.metrics import get_metrics
+
+
+@dataclass
+class ConnectionStats:
+    requests: int = 0
+    connections_created: int = 0
+    connections_reused: int = 0
+    dns_cache_hits: int = 0
+    dns_cache_misses: int = 0
+
+    @property
+    def handshakes_saved(self) -> int:
+        return self.connections_reused
+
+
+class SessionPool:
+    """
+    Коннекторы, общие для всех аккаунтов на одном и том же прокси на протяжении всей работы скрипта.
+     Коннектор хранит открытые соединения (keep-alive, TLS) и DNS кеш.
+
+    Каждый аккаунт получает свою легкую ClientSession поверх общего коннектора:
+     у аккаунтов разные куки и user-agent, поэтому сама сессия не разделяется.
+    """
+
+    def __init__(
+            self,
+            *,
+            limit: int = 100,
+            limit_per_host: int = 0,
+            keepalive_timeout: float = 30,
+            dns_cache_ttl: int = 300,
+            trace_configs: Iterable[aiohttp.TraceConfig] = (),
+            request_class: type[aiohttp.ClientRequest] = aiohttp.ClientRequest,
+    ):
+        self._connector_kwargs = {
+            'limit': limit,
+            'limit_per_host': limit_per_host,
+            'keepalive_timeout': keepalive_timeout,
+            'ttl_dns_cache': dns_cache_ttl,
+        }
+        self._connectors: dict[Proxy | None, aiohttp.TCPConnector] = {}
+        self.stats = ConnectionStats()
+        self._trace_configs = [self._create_trace_config(), *trace_configs]
+        self._request_class = request_class
+
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        stats = self.stats
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            stats.requests += 1
+
+        async def on_connection_create_end(session, context, params):
+            stats.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            stats.connections_reused += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            stats.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            stats.dns_cache_misses += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    def _get_connector(self, proxy: Proxy = None) -> aiohttp.TCPConnector:
+        connector = self._connectors.get(proxy)
+        if connector is None or connector.closed:
+            if proxy:
+                from aiohttp_socks import ProxyConnector
+
+                connector = ProxyConnector.from_url(proxy.as_url, **self._connector_kwargs)
+            else:
+                connector = aiohttp.TCPConnector(**self._connector_kwargs)
+            self._connectors[proxy] = connector
+        return connector
+
+    def session(self, proxy: Proxy = None) -> aiohttp.ClientSession:
+        return aiohttp.ClientSession(
+            connector=self._get_connector(proxy),
+            connector_owner=False,
+            trace_configs=self._trace_configs,
+            request_class=self._request_class,
+        )
+
+    def log_stats(self, logging_level: LoggingLevel = "DEBUG"):
+        stats = asdict(self.stats)
+        logger.log(logging_level, f"Соединения: {stats}, сэкономлено рукопожатий: {self.stats.handshakes_saved}")
+
+    def reset_stats(self):
+        for field, value in asdict(ConnectionStats()).items():
+            setattr(self.stats, field, value)
+
+    async def close(self):
+        while self._connectors:
+            _, connector = self._connectors.popitem()
+            await connector.close()
+
+
+_session_pool: SessionPool | None = None
+
+
+def get_session_pool() -> SessionPool:
+    global _session_pool
+    if _session_pool is None:
+        _session_pool = SessionPool(
+            limit=CONFIG.CONNECTION_LIMIT,
+            limit_per_host=CONFIG.CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=CONFIG.KEEPALIVE_TIMEOUT,
+            dns_cache_ttl=CONFIG.DNS_CACHE_TTL,
+            # Метрики после лимитов: время ожидания лимита не попадает во время запроса
+            trace_configs=[get_rate_limiter().create_trace_config(), get_metrics().create_trace_config()],
+        )
+    return _session_pool
+
+
+def set_session_pool(session_pool: SessionPool):
+    """
+    Подменяет общий пул (например, пулом, который отправляет запросы на локальный стенд).
+    """
+    global _session_pool
+    _session_pool = session_pool
+
+
+async def close_session_pool():
+    global _session_pool
+    if _session_pool is not None:
+        await _session_pool.close()
+        _session_pool = None
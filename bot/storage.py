@@ -0,0 +1,269 @@
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+from copy import deepcopy
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Callable
+
+from bot.config import CONFIG
+from bot.logger import logger
+
+
+class AccountStorage(ABC):
+    """
+    Хранилище записей аккаунтов. Ключ записи — Twitter токен.
+    """
+
+    @abstractmethod
+    def load_all(self) -> dict[str, dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, twitter_token: str) -> dict | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert_many(self, records: dict[str, dict]):
+        raise NotImplementedError
+
+    def upsert(self, twitter_token: str, record: dict):
+        self.upsert_many({twitter_token: record})
+
+    def is_empty(self) -> bool:
+        return not self.load_all()
+
+    def flush(self):
+        pass
+
+    def compact(self):
+        """
+        Возвращает освободившееся место на диске.
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class TinyDBStorage(AccountStorage):
+    """
+    Старое хранилище в одном JSON файле. Каждая запись перезаписывает файл целиком.
+    """
+
+    def __init__(self, db_path: str | Path):
+        # TinyDB нужен только для миграции старого accounts.json
+        from tinydb import TinyDB, Query
+
+        self._db = TinyDB(db_path)
+        self._query = Query()
+
+    def load_all(self) -> dict[str, dict]:
+        return {record['auth_tokens']['twitter']: dict(record) for record in self._db.all()}
+
+    def get(self, twitter_token: str) -> dict | None:
+        record = self._db.get(self._query['auth_tokens']['twitter'] == twitter_token)
+        return dict(record) if record else None
+
+    def upsert_many(self, records: dict[str, dict]):
+        for twitter_token, record in records.items():
+            self._db.upsert(record, self._query['auth_tokens']['twitter'] == twitter_token)
+
+    def close(self):
+        self._db.close()
+
+
+class SQLiteStorage(AccountStorage):
+    """
+    SQLite (WAL) хранилище: одна строка на аккаунт, запись — upsert только изменившихся аккаунтов.
+    """
+
+    def __init__(self, db_path: str | Path):
+        self._lock = Lock()
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS accounts ("
+            " twitter_token TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL"
+            ")"
+        )
+        self._connection.commit()
+
+    def load_all(self) -> dict[str, dict]:
+        with self._lock:
+            rows = self._connection.execute("SELECT twitter_token, data FROM accounts").fetchall()
+        return {twitter_token: json.loads(data) for twitter_token, data in rows}
+
+    def get(self, twitter_token: str) -> dict | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data FROM accounts WHERE twitter_token = ?", (twitter_token, )
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def upsert_many(self, records: dict[str, dict]):
+        rows = [(twitter_token, json.dumps(record)) for twitter_token, record in records.items()]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO accounts (twitter_token, data) VALUES (?, ?)"
+                " ON CONFLICT(twitter_token) DO UPDATE SET data = excluded.data",
+                rows,
+            )
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM accounts LIMIT 1").fetchone() is None
+
+    def compact(self):
+        with self._lock:
+            self._connection.execute("VACUUM")
+            self._connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class WriteBehindStorage(AccountStorage):
+    """
+    Откладывает запись: сохраненные аккаунты помечаются грязными,
+     повторные сохранения одного аккаунта склеиваются,
+     а фоновый поток записывает их пачкой раз в flush_interval секунд.
+    """
+
+    def __init__(self, storage: AccountStorage, flush_interval: float = 1.0):
+        self._storage = storage
+        self._flush_interval = flush_interval
+        self._dirty: dict[str, dict] = {}
+        self._dirty_lock = Lock()
+        self._storage_lock = Lock()
+        self._flush_listeners: list[Callable[[], Callable[[], None]]] = []
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, name="account-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self._flush_interval):
+            try:
+                self.flush()
+            except Exception as exc:
+                logger.error(f"Не удалось сохранить аккаунты: {exc}")
+
+    def load_all(self) -> dict[str, dict]:
+        with self._storage_lock:
+            records = self._storage.load_all()
+        with self._dirty_lock:
+            records.update(self._dirty)
+        return records
+
+    def get(self, twitter_token: str) -> dict | None:
+        with self._dirty_lock:
+            if twitter_token in self._dirty:
+                return self._dirty[twitter_token]
+        with self._storage_lock:
+            return self._storage.get(twitter_token)
+
+    def upsert_many(self, records: dict[str, dict]):
+        # Снимок записи: аккаунт продолжает меняться, пока запись ждет своей очереди
+        records = deepcopy(records)
+        with self._dirty_lock:
+            self._dirty.update(records)
+
+    def is_empty(self) -> bool:
+        with self._dirty_lock:
+            if self._dirty:
+                return False
+        with self._storage_lock:
+            return self._storage.is_empty()
+
+    def add_flush_listener(self, listener: Callable[[], Callable[[], None]]):
+        """
+        :param listener: Вызывается перед каждой записью и возвращает функцию,
+         которая будет вызвана после того, как запись прошла успешно.
+         Все, что было сохранено до вызова listener, к этому моменту уже на диске.
+        """
+        self._flush_listeners.append(listener)
+
+    def remove_flush_listener(self, listener: Callable[[], Callable[[], None]]):
+        self._flush_listeners.remove(listener)
+
+    def flush(self):
+        with self._storage_lock:
+            on_flushed = [listener() for listener in self._flush_listeners]
+            with self._dirty_lock:
+                records, self._dirty = self._dirty, {}
+            if records:
+                try:
+                    self._storage.upsert_many(records)
+                except Exception:
+                    # Возвращаем записи, не затирая более свежие
+                    with self._dirty_lock:
+                        self._dirty = records | self._dirty
+                    raise
+            for callback in on_flushed:
+                callback()
+
+    def compact(self):
+        self.flush()
+        with self._storage_lock:
+            self._storage.compact()
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+        self.flush()
+        self._storage.close()
+
+
+STORAGE_BACKENDS: dict[str, type[AccountStorage]] = {
+    ".json": TinyDBStorage,
+    ".db": SQLiteStorage,
+    ".sqlite": SQLiteStorage,
+    ".sqlite3": SQLiteStorage,
+}
+
+_storages: dict[Path, AccountStorage] = {}
+
+
+def open_storage(db_path: str | Path) -> AccountStorage:
+    """
+    Возвращает хранилище для файла. Бэкенд выбирается по расширению файла,
+     одно и то же хранилище переиспользуется на протяжении всей работы скрипта.
+     Запись в хранилище отложенная, см. WriteBehindStorage.
+    """
+    db_path = Path(db_path).resolve()
+    if db_path not in _storages:
+        try:
+            storage_class = STORAGE_BACKENDS[db_path.suffix]
+        except KeyError:
+            raise ValueError(f"Unsupported accounts storage: {db_path.name}")
+        _storages[db_path] = WriteBehindStorage(storage_class(db_path), CONFIG.SAVE_INTERVAL)
+    return _storages[db_path]
+
+
+def close_storages():
+    while _storages:
+        _, storage = _storages.popitem()
+        storage.close()
+
+
+def migrate_from_json(json_path: str | Path, storage: AccountStorage) -> int:
+    """
+    Переносит аккаунты из старого accounts.json в пустое хранилище.
+    :return: Количество перенесенных аккаунтов.
+    """
+    json_path = Path(json_path)
+    if not json_path.exists() or not json_path.stat().st_size or not storage.is_empty():
+        return 0
+
+    legacy_storage = TinyDBStorage(json_path)
+    try:
+        records = legacy_storage.load_all()
+    finally:
+        legacy_storage.close()
+
+    storage.upsert_many(records)
+    logger.info(f"Перенесено {len(records)} аккаунтов из {json_path}")
+    return len(records)
@@ -1,13 +1,52 @@
+import asyncio
+import json
+import time
+
 from better_automation import TwitterAPI
-from better_automation.twitter.errors import HTTPException as TwitterException
+from better_automation.twitter.errors import (
+    HTTPException as TwitterException,
+    TooManyRequests as TwitterTooManyRequests,
+    TwitterServerError,
+)
 
-from bot.account import Account
+from bot.account import Account, TwitterStatus
 from bot.api import MemelandAPI
 from bot.logger import logger, LoggingLevel
-from bot.paths import ACCOUNTS_JSON
+from bot.models import TwitterUser, from_dict
+from bot.config import CONFIG
+from bot.paths import ACCOUNTS_DB, TWITTER_RAW_JSONL
+
+
+def archive_twitter_user(user_info: dict):
+    with open(TWITTER_RAW_JSONL, "a", encoding="utf-8") as file:
+        file.write(json.dumps({'fetched_at': int(time.time()), 'user': user_info}, ensure_ascii=False) + "\n")
 
 
-ELON_MUSK_ID = 44196397
+# Коды ошибок Twitter, по которым определяется статус аккаунта
+TWITTER_ERROR_STATUSES: dict[int, TwitterStatus] = {32: "BAD_TOKEN", 64: "BANNED", 326: "LOCKED"}
+
+
+class TwitterUserUnavailable(Exception):
+    """
+    Вместо пользователя пришел объект UserUnavailable (например, reason=Suspended).
+    """
+    def __init__(self, reason: str | None):
+        super().__init__(reason)
+        self.reason = reason
+
+
+async def _request_twitter_info(twitter: TwitterAPI, account: Account):
+    twitter_username = await twitter.request_username()
+    user_info = await twitter.request_user_info(twitter_username)
+    if user_info.get("__typename") == "UserUnavailable":
+        raise TwitterUserUnavailable(user_info.get("reason"))
+    if CONFIG.ARCHIVE_RAW_TWITTER_INFO:
+        archive_twitter_user(user_info)
+    account.twitter_info = from_dict(TwitterUser, user_info)
+    # Успешные запросы от имени аккаунта заодно подтверждают, что токен рабочий
+    account.twitter_status = "GOOD"
+    account.mark_fetched("twitter_info")
+    account.mark_fetched("twitter_status")
 
 
 async def update_twitter_status(
@@ -15,20 +54,30 @@ async def update_twitter_status(
         account: Account,
         logging_level: LoggingLevel = "DEBUG",
 ):
+    """
+    Проверяет токен запросами только на чтение (имя пользователя и информация о нем)
+     и заодно обновляет информацию о Твиттер аккаунте.
+    """
     try:
-        await twitter.follow(ELON_MUSK_ID)
-        account.twitter_status = "GOOD"
-        account.save(ACCOUNTS_JSON)
-    except TwitterException as e:
-        if any(code in e.api_codes for code in (32, )):
-            account.twitter_status = "BAD_TOKEN"
-            account.save(ACCOUNTS_JSON)
-        if any(code in e.api_codes for code in (64, )):
+        await _request_twitter_info(twitter, account)
+    except (TwitterTooManyRequests, TwitterServerError):
+        # Статус неизвестен: аккаунт будет повторен (см. AccountScheduler)
+        raise
+    except TwitterUserUnavailable as e:
+        logger.warning(f"{account} Твиттер аккаунт недоступен: {e}")
+        if e.reason == "Suspended":
             account.twitter_status = "BANNED"
-            account.save(ACCOUNTS_JSON)
-        if any(code in e.api_codes for code in (326, )):
-            account.twitter_status = "LOCKED"
-            account.save(ACCOUNTS_JSON)
+            account.mark_fetched("twitter_status")
+        else:
+            # Причина может быть временной: статус не фиксируется, аккаунт будет проверен повторно
+            account.twitter_status = "UNKNOWN"
+    except TwitterException as e:
+        for code in e.api_codes:
+            if code in TWITTER_ERROR_STATUSES:
+                account.twitter_status = TWITTER_ERROR_STATUSES[code]
+                account.mark_fetched("twitter_status")
+                break
+    account.save(ACCOUNTS_DB)
 
     logger.log(logging_level, f"{account} Статус Твиттер аккаунта: {account.twitter_status}")
 
@@ -38,9 +87,8 @@ async def update_twitter_info(
         account: Account,
         logging_level: LoggingLevel = "DEBUG",
 ):
-    twitter_username = await twitter.request_username()
-    account.twitter_info = await twitter.request_user_info(twitter_username)
-    account.save(ACCOUNTS_JSON)
+    await _request_twitter_info(twitter, account)
+    account.save(ACCOUNTS_DB)
     logger.log(logging_level, f"{account} Информация о Твиттер аккаунте успешно запрошена")
 
 
@@ -49,7 +97,7 @@ async def update_memeland_info(
         account: Account,
         logging_level: LoggingLevel = "DEBUG",
 ):
-    account.memeland_info = await memeland.request_info()
-    account.tasks = await memeland.request_tasks()
-    account.save(ACCOUNTS_JSON)
+    account.memeland_info, account.tasks = await asyncio.gather(memeland.request_info(), memeland.request_tasks())
+    account.mark_fetched("memeland_info")
+    account.save(ACCOUNTS_DB)
     logger.log(logging_level, f"{account} Информация об аккаунте Memeland и тасках успешно запрошена")
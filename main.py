@@ -1,18 +1,29 @@
+import argparse
 import asyncio
+import json
+import sys
+import time
 from typing import Callable, Iterable
 
-import questionary
 from better_automation.utils import load_toml, load_lines
 from better_proxy import Proxy
 
-from bot.logger import logger, setup_logger
-from bot.paths import LOG_DIR, TOKENS_TXT, ACCOUNTS_JSON
-from bot.config import CONFIG
+from bot.logger import logger, setup_logger, flush_console_summary, close_logger
+from bot.paths import LOG_DIR, TOKENS_TXT, ACCOUNTS_JSON, ACCOUNTS_DB, METRICS_DIR, init_paths
+from bot.config import CONFIG, load_config
 from bot.author import TG_LINK
 from bot.account import extract_or_create_accounts, Account
+from bot.index import AccountIndex, set_account_index
+from bot.storage import open_storage, close_storages, migrate_from_json
+from bot.crypto import shutdown_executor
+from bot.session import get_session_pool, close_session_pool
+from bot.ratelimit import get_rate_limiter
 from bot.scripts import auth_accounts, link_wallets, complete_tasks
 from bot.output import make_output
 from bot.follower import follow_accounts
+from bot.process import ProcessingReport
+from bot.journal import open_journal, close_journal
+from bot.metrics import get_metrics
 
 PROJECT_INFO = load_toml('pyproject.toml')
 PROJECT_VERSION = PROJECT_INFO['tool']['poetry']['version']
@@ -23,48 +34,176 @@ def print_script_info():
     print(f"Telegram: {TG_LINK}")
 
 
-def print_total_points(accounts: Iterable[Account]):
-    total_points = sum((account.points for account in accounts if account.points))
-    print(f"Total points: {total_points}")
+# Модули для неинтерактивного запуска: python main.py run auth link tasks output
+MODULES: dict[str, Callable] = {
+    'follow': follow_accounts,
+    'auth': auth_accounts,
+    'link': link_wallets,
+    'tasks': complete_tasks,
+    'output': make_output,
+}
 
 
-async def select_module(modules) -> Callable:
+def print_accounts_stats(accounts: AccountIndex):
+    print(f"Accounts: {len(accounts)}"
+          f" | Memeland auth: {accounts.count([('memeland_token', True)])}"
+          f" | Linked wallets: {accounts.count([('wallet_is_linked', True)])}")
+    print(f"Total points: {accounts.total_points}")
+
+
+async def select_module(modules: dict[str, str | None]) -> str | None:
+    import questionary
+
     module_name = await questionary.select("Select module:", choices=list(modules.keys())).ask_async()
     return modules[module_name]
 
 
-async def main():
-    setup_logger(LOG_DIR, console_logging_level=CONFIG.LOGGING_LEVEL)
-
+def load_accounts() -> AccountIndex | None:
     twitter_auth_tokens = load_lines(TOKENS_TXT)
 
     if not twitter_auth_tokens:
         logger.warning(f"No twitter auth tokens ('{TOKENS_TXT}')")
-        return
+        return None
 
     logger.info(f"Total twitter auth tokens: {len(twitter_auth_tokens)}")
 
-    accounts = extract_or_create_accounts(twitter_auth_tokens, ACCOUNTS_JSON)
+    migrate_from_json(ACCOUNTS_JSON, open_storage(ACCOUNTS_DB))
+    accounts = AccountIndex(extract_or_create_accounts(twitter_auth_tokens, ACCOUNTS_DB))
+    set_account_index(accounts)
+    return accounts
+
+
+async def run_module(
+        module_name: str,
+        accounts: Iterable[Account],
+        *,
+        resume: bool = False,
+) -> ProcessingReport:
+    """
+    Запускает модуль. Аккаунты, сессии и кеши остаются общими для всех модулей за время работы скрипта.
+    :param resume: Пропустить шаги, выполненные в прошлом (прерванном) проходе модуля.
+    """
+    open_journal(module_name, resume=resume)
+    try:
+        report = await MODULES[module_name](accounts)
+    finally:
+        await asyncio.to_thread(close_journal)
+    get_session_pool().log_stats()
+    get_session_pool().reset_stats()
+    get_rate_limiter().log_waited()
+    get_rate_limiter().reset_waited()
+    get_metrics().log()
+    get_metrics().dump(METRICS_DIR, module_name)
+    get_metrics().reset()
+    flush_console_summary()
+    return report if isinstance(report, ProcessingReport) else ProcessingReport()
+
+
+async def interactive():
+    accounts = load_accounts()
+    if accounts is None:
+        return
 
     modules = {
         'Exit': None,
-        '[0] Follow each other': follow_accounts,
-        '[1] Auth accounts': auth_accounts,
-        '[2] Link wallets': link_wallets,
-        '[3] Complete tasks': complete_tasks,
-        'Make output': make_output,
+        '[0] Follow each other': 'follow',
+        '[1] Auth accounts': 'auth',
+        '[2] Link wallets': 'link',
+        '[3] Complete tasks': 'tasks',
+        'Make output': 'output',
     }
 
-    while True:
-        print_script_info()
-        print_total_points(accounts)
-        module = await select_module(modules)
-
-        if module is None:
-            break
-
-        await module(accounts)
+    try:
+        while True:
+            print_script_info()
+            print_accounts_stats(accounts)
+            module_name = await select_module(modules)
+
+            if module_name is None:
+                break
+
+            await run_module(module_name, accounts)
+    finally:
+        await close_session_pool()
+
+
+async def run(module_names: list[str], *, resume: bool = False) -> dict:
+    """
+    Запускает модули по очереди без вопросов.
+    :return: Итог в виде словаря для вывода в JSON.
+    """
+    summary = {'accounts': 0, 'modules': [], 'total_points': 0, 'ok': True}
+
+    accounts = load_accounts()
+    if accounts is None:
+        summary['ok'] = False
+        return summary
+    summary['accounts'] = len(accounts)
+
+    try:
+        for module_name in module_names:
+            logger.info(f"Модуль {module_name}")
+            started_at = time.monotonic()
+            report = await run_module(module_name, accounts, resume=resume)
+            summary['modules'].append({
+                'name': module_name,
+                'seconds': round(time.monotonic() - started_at, 3),
+                **report.to_dict(),
+            })
+            if report.failed:
+                summary['ok'] = False
+    finally:
+        await close_session_pool()
+
+    summary['total_points'] = accounts.total_points
+    return summary
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Без аргументов запускается интерактивное меню.")
+    subparsers = parser.add_subparsers(dest="command")
+    run_parser = subparsers.add_parser("run", help="Запустить модули по очереди без вопросов")
+    run_parser.add_argument("modules", nargs="+", choices=list(MODULES), metavar="module",
+                            help=f"Модули в порядке запуска: {', '.join(MODULES)}")
+    run_parser.add_argument("--summary", help="Дополнительно сохранить итог в JSON файл")
+    run_parser.add_argument("--resume", action="store_true",
+                            help="Продолжить прерванный проход: пропустить шаги, уже выполненные по журналу модуля")
+    return parser.parse_args(argv)
+
+
+async def main(argv: list[str] = None) -> int:
+    args = parse_args(argv)
+    init_paths()
+    load_config()
+    setup_logger(
+        LOG_DIR,
+        console_logging_level=CONFIG.LOGGING_LEVEL,
+        serialize=CONFIG.LOG_FORMAT == "json",
+        file_buffering=CONFIG.LOG_FILE_BUFFERING,
+        console_summary_interval=CONFIG.CONSOLE_SUMMARY_INTERVAL,
+        # В режиме run в stdout только итог в JSON, лог уходит в stderr
+        console_stream=sys.stderr if args.command == "run" else None,
+    )
+
+    if args.command != "run":
+        await interactive()
+        return 0
+
+    summary = await run(args.modules, resume=args.resume)
+    summary_json = json.dumps(summary, ensure_ascii=False)
+    flush_console_summary()
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as file:
+            file.write(summary_json)
+    print(summary_json)
+    return 0 if summary['ok'] else 1
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    try:
+        exit_code = asyncio.run(main())
+    finally:
+        close_storages()
+        shutdown_executor()
+        close_logger()
+    sys.exit(exit_code)